@@ -1,10 +1,24 @@
 import os
+import re
 import subprocess
 import sys
 import stat
 import shutil
-import difflib
-from summarizer import GPTDiffSummarizer, OpenRouterSummarizer
+import hashlib
+import time
+from collections import deque
+from summarizer import get_summarizer
+from mirror_cache import MirrorCache
+from object_store import open_object_store
+from bisect_engine import BisectEngine
+from diffing import annotated_diff, DEFAULT_CONTEXT
+from verdict_cache import VerdictCache
+from prefetch import SpeculativePrefetcher
+from verdict import parse_verdict, VerdictError
+from journal import Journal
+from prescreen import Prescreener, NON_SEMANTIC
+from relevance import problem_prior
+from mark_memory import open_scope, problem_signature
 
 
 # === Constants ===
@@ -12,26 +26,92 @@ DEFAULT_REPO_PATH = "C:\\Users\\eugen\\Documents\\testground"
 DEFAULT_TARGET_PATH = "game.py"
 TEMP_DIR_NAME = "tmp"
 REVERT = False
+# known_blobs value for target content that has been marked both good and bad.
+BLOB_CONFLICT = "conflict"
 previous_content = ''
 
 
+# Settings written to the journal and restored by resume=1.
+RESUMED_SETTINGS = ("repo_url", "target_path", "problem", "engine", "prune", "context", "summarizer",
+                    "auto_threshold", "prescreen", "prior")
+
+
 REPO_PATH = DEFAULT_REPO_PATH
 REPO_WORK_PATH = os.path.join(REPO_PATH, TEMP_DIR_NAME)
 TARGET_PATH = DEFAULT_TARGET_PATH
 
 
+def is_glob(path):
+    return any(c in path for c in "*?[")
+
+
+def glob_to_regex(pattern):
+    # Same rules as git's :(glob) magic: '*' stays inside one directory, '**' crosses them.
+    if not is_glob(pattern):
+        return re.compile(re.escape(pattern) + "(?:/.*)?")
+    regex = re.escape(pattern).replace(r"\*\*/", "(?:.*/)?").replace(r"\*\*", ".*")
+    regex = regex.replace(r"\*", "[^/]*").replace(r"\?", "[^/]").replace(r"\[", "[").replace(r"\]", "]")
+    return re.compile(regex)
+
 
 class RepoManager:
-    def __init__(self, repo_path, target_path):
+    def __init__(self, repo_path, target_path, mirrors=None):
         self.repo_path = repo_path
         self.target_path = target_path
+        self.target_paths = [p.strip() for p in target_path.split(",") if p.strip()]
         self.work_path = os.path.join(repo_path, TEMP_DIR_NAME)
+        self.mirrors = mirrors or MirrorCache()
+        self.mirror_path = None
+        self._objects = None
+
+    @property
+    def objects(self):
+        if self._objects is None:
+            self._objects = open_object_store(self.work_path)
+        return self._objects
+
+    def read_file(self, commit, path=None):
+        return self.objects.text(commit, path or self.target_paths[0])
+
+    def has_globs(self):
+        return any(is_glob(p) for p in self.target_paths)
+
+    def pathspecs(self):
+        return [f":(glob){p}" if is_glob(p) else p for p in self.target_paths]
+
+    def target_blobs(self, commit):
+        if self.has_globs():
+            # ls-tree does not understand :(glob) magic, so match the listing here.
+            out, _, _ = self.run_cmd(["git", "ls-tree", "-r", commit])
+            patterns = [glob_to_regex(p) for p in self.target_paths]
+            entries = (line.split("\t", 1) for line in out.splitlines())
+            return tuple((path, meta.split()[2]) for meta, path in entries
+                         if any(pattern.fullmatch(path) for pattern in patterns))
+        blobs = []
+        for path in self.target_paths:
+            info = self.objects.info(f"{commit}:{path}")
+            if info is not None:
+                blobs.append((path, info[0]))
+        return tuple(blobs)
+
+    def read_targets(self, commit):
+        files = {}
+        for path, sha in self.target_blobs(commit):
+            obj = self.objects.read(sha)
+            if obj is not None:
+                files[path] = obj[2].decode("utf-8", errors="ignore")
+        return files
+
+    def close(self):
+        if self._objects is not None:
+            self._objects.close()
+            self._objects = None
 
     def run_cmd(self, cmd, work_path=None):
         if work_path is None:
             work_path = self.work_path
         try:
-            result = subprocess.run(cmd, cwd=work_path, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            result = subprocess.run(cmd, cwd=work_path, shell=isinstance(cmd, str), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
             stdout = result.stdout.strip() if result.stdout else ""
             stderr = result.stderr.strip() if result.stderr else ""
             return stdout, stderr, result.returncode
@@ -52,47 +132,121 @@ class RepoManager:
 
 
     def remove_repo(self):
+        self.close()
+        self.mirrors.remove_worktree(self.mirror_path, self.work_path)
         if os.path.exists(self.work_path):
             shutil.rmtree(self.work_path, onexc=self.force_remove_readonly)
 
 
+    def has_worktree(self):
+        # The work directory sits inside repo_path, so make sure git answers
+        # for the worktree itself and not the enclosing checkout.
+        if not os.path.isdir(self.work_path):
+            return False
+        top, _, code = self.run_cmd(["git", "rev-parse", "--show-toplevel"])
+        return code == 0 and os.path.realpath(top) == os.path.realpath(self.work_path)
+
     def sparse_checkout(self, repo_url):
-        print(f"Cloning repo sparsely into: {self.work_path}")
+        print(f"Adding sparse worktree from mirror cache into: {self.work_path}")
+        self.mirror_path = self.mirrors.mirror_path(repo_url)
         self.remove_repo()
-        print(f"git clone --filter=blob:none --no-checkout {repo_url} {self.work_path}")
-        subprocess.run(f"git clone --filter=blob:none --no-checkout {repo_url} {self.work_path}", shell=True, check=True)
-        subprocess.run("git sparse-checkout init --cone", cwd=self.work_path, shell=True, check=True)
-        subprocess.run(f"git sparse-checkout set {self.target_path}", cwd=self.work_path, shell=True, check=True)
-        try:
-            subprocess.run("git checkout main", cwd=self.work_path, shell=True, check=True)
-        except subprocess.CalledProcessError:
-            subprocess.run("git checkout master", cwd=self.work_path, shell=True, check=True)
-            print("Checked out 'master' branch.")
+        sparse_paths = [p for p in self.target_paths if not is_glob(p)] or ["."]
+        self.mirror_path = self.mirrors.add_worktree(repo_url, self.work_path, sparse_paths)
+        self.mirrors.prefetch_blobs(self.mirror_path, ["HEAD"], self.pathspecs())
+
+    def warm_targets(self, revs):
+        return self.objects.warm(self.mirrors.blobs(self.mirror_path, revs, self.pathspecs()))
 
 
 class BisectSession:
-    def __init__(self, repo_manager, summarizer):
+    def __init__(self, repo_manager, summarizer, engine="graph", prune=False, context=DEFAULT_CONTEXT, prefetcher=None,
+                 auto_threshold=None, journal=None, replay=None, prescreen=False, prescreen_workers=None,
+                 prior=None, resume=False, memory=None):
         self.repo = repo_manager
         self.summarizer = summarizer
-        self.previous_content = ''
-
-    def diff_and_summarize(self):
-        target_file = os.path.join(self.repo.work_path, self.repo.target_path)
-        if not os.path.isfile(target_file):
+        self.engine_name = engine
+        self.engine = None
+        self.prune = prune
+        self.known_blobs = {}
+        self.context = context
+        self.prefetcher = prefetcher
+        self.auto_threshold = auto_threshold
+        self.journal = journal
+        self.replay = replay
+        self.resume = resume
+        self.memory = memory
+        self.prescreen = prescreen
+        self.prescreen_workers = prescreen_workers
+        self.prior = prior
+        self.same_as = {}
+        self.followers = {}
+        self.previous_files = {}
+        self.previous_commit = None
+
+    def step_diff(self, previous_files, files):
+        parts = []
+        for path in sorted(set(files) | set(previous_files)):
+            diff = annotated_diff(previous_files.get(path), files.get(path), self.context,
+                                  fromfile=f"previous/{path}", tofile=f"current/{path}")
+            if diff:
+                parts.append(diff)
+        return "\n".join(parts) if parts else "No changes."
+
+    def diff_and_summarize(self, commit="HEAD"):
+        files = self.repo.read_targets(commit)
+        if not files:
             print(f"[File '{self.repo.target_path}' not found at current commit]")
+            if not self.previous_files:
+                return
+
+        diff_text = self.step_diff(self.previous_files, files)
+        key = (self.previous_commit, commit)
+        self.previous_files = files
+        self.previous_commit = commit
+
+        print(f"--- Diff of {self.repo.target_path} from previous bisect step ---")
+        print(diff_text)
+        return self.show_summary(key, diff_text)
+
+    def show_summary(self, key, diff_text):
+        future = self.prefetcher.take(key) if self.prefetcher else None
+        if future is None:
+            return self.summarizer.summarize(diff_text)
+        try:
+            prefetched_diff, content = future.result()
+        except Exception as e:
+            print(f"[Prefetch Error] {e}")
+            return self.summarizer.summarize(diff_text)
+        if prefetched_diff != diff_text or content is None:
+            return self.summarizer.summarize(diff_text)
+        print("--- Summary (prefetched) ---")
+        print(content)
+        return content
+
+    def analyse_steps(self, previous_files, commits):
+        diffs = [self.step_diff(previous_files, self.repo.read_targets(commit)) for commit in commits]
+        answers = iter(self.summarizer.analyse_batch([diff for diff in diffs if diff != "No changes."]))
+        return [(diff, None if diff == "No changes." else next(answers)) for diff in diffs]
+
+    def speculate(self, commit):
+        # Only two commits can come next: one if this commit is good, one if bad.
+        if self.prefetcher is None:
             return
-
-        print(f"Contents of file {self.repo.target_path} at current commit:\n")
-        with open(target_file, 'r', encoding='utf-8', errors='ignore') as f:
-            current_content = f.readlines()
-            # diff = list(difflib.unified_diff(self.previous_content, current_content, lineterm='', fromfile='previous', tofile='current'))
-            # print("--- Diff from previous commit ---")
-            # diff_text = ''.join(diff) if diff else "No changes."
-            # print(diff_text)
-            # self.previous_content = current_content
-            diff_text = "".join(current_content)
-            print(diff_text)
-            self.summarizer.summarize(diff_text)
+        self.prefetcher.discard(keep=[(self.previous_commit, commit)])
+        files = self.repo.read_targets(commit)
+        current_blobs = self.repo.target_blobs(commit)
+        jobs = {}
+        for mark in ("good", "bad"):
+            candidate = self.engine.peek(commit, mark)
+            if candidate is None:
+                continue
+            blobs = self.repo.target_blobs(candidate)
+            if self.known_blobs.get(blobs) in ("good", "bad") or blobs == current_blobs:
+                continue
+            jobs[(commit, candidate)] = candidate
+        # Both candidates go to the summarizer together so a batching backend
+        # (the local model) can judge them in one pass.
+        self.prefetcher.submit_batch(jobs, self.analyse_steps, files)
 
     def prompt_user(self):
         while True:
@@ -101,23 +255,266 @@ class BisectSession:
                 return choice
 
     def run(self):
+        if self.engine_name == "git":
+            return self.run_git()
+
+        meta = self.journal.meta() if self.journal is not None else None
+        if meta and meta.get("head"):
+            head_commit, root_commits = meta["head"], " ".join(meta["roots"])
+        else:
+            head_commit, _, _ = self.repo.run_cmd("git rev-parse HEAD")
+            root_commits, _, _ = self.repo.run_cmd("git rev-list --max-parents=0 HEAD")
+
+        print(f"Starting bisect from HEAD={head_commit} (bad) to ROOT={root_commits} (good)...")
+        paths = self.repo.pathspecs() if self.prune else None
+        self.engine = BisectEngine.load(self.repo.work_path, head_commit, root_commits.split(), paths)
+        print(f"Loaded {len(self.engine.graph)} candidate commits"
+              + (f" touching {', '.join(self.repo.target_paths)}." if paths else "."))
+        print(f"Holding {self.repo.warm_targets([head_commit])} target blobs in memory.")
+        problem = getattr(self.summarizer, "problem", None)
+        if self.prior and problem:
+            # Hunks only for the target paths, whose blobs the mirror already holds.
+            weights = problem_prior(self.repo.work_path, head_commit, root_commits.split(), problem, paths, self.prior,
+                                    hunk_paths=self.repo.pathspecs())
+            self.engine.set_weights(weights)
+            ranked = sorted(weights, key=weights.get, reverse=True)[:3]
+            print(f"Weighting split points by relevance to the problem; most likely: {', '.join(c[:10] for c in ranked)}")
+        self.remember_blobs(head_commit, "bad")
+        for root_commit in root_commits.split():
+            self.remember_blobs(root_commit, "good")
+        restored = self.restore() if self.resume else 0
+        if restored:
+            print(f"Resumed {restored} marks from {self.journal.path}")
+        else:
+            if self.prescreen:
+                self.apply_prescreen(head_commit)
+            if self.memory is not None:
+                self.recall()
+        self.previous_commit = root_commits.split()[0]
+        self.previous_files = self.repo.read_targets(self.previous_commit)
+        if restored:
+            self.resume_baseline(self.journal.entries())
+        if self.replay:
+            replayed = Journal(self.replay)
+            print(f"Replayed {replayed.replay(self.engine)} marks from {self.replay}")
+            self.resume_baseline(replayed.entries())
+
+        while True:
+            current_commit = self.engine.next_commit()
+            if current_commit is None:
+                self.report_first_bad()
+                break
+
+            known = self.known_blobs.get(self.repo.target_blobs(current_commit))
+            if known in ("good", "bad"):
+                print(f"Target unchanged from an already-marked {known} commit, auto-marking {current_commit}")
+                self.record(current_commit, known, "blob-match")
+                continue
+
+            print(f"Currently at commit: {current_commit} (roughly {self.engine.steps_left()} steps left)")
+            started = time.time()
+            self.speculate(current_commit)
+            summary = self.diff_and_summarize(current_commit)
+            summarized = time.time()
+
+            mark, verdict = self.auto_mark(summary)
+            if mark:
+                print(f"Auto-marking {current_commit} as {mark} "
+                      f"(confidence {verdict.behaviour_confidence:.0f} >= {self.auto_threshold:.0f})")
+                self.record(current_commit, mark, "auto", verdict, timings={"summary": round(summarized - started, 3)})
+                continue
+
+            choice = self.prompt_user()
+            if choice == "c":
+                print("Bisect cancelled by user.")
+                break
+            self.record(current_commit, 'good' if choice == 'g' else 'bad', "human", verdict,
+                        timings={"summary": round(summarized - started, 3), "decision": round(time.time() - summarized, 3)})
+
+    def restore(self):
+        # Marks come back exactly as journaled (propagated ones included), so
+        # nothing is re-screened, re-summarized or written again.
+        graph = self.engine.graph
+        count = 0
+        for entry in self.journal.entries():
+            commit, mark = entry["commit"], entry["mark"]
+            if commit not in graph.index:
+                continue
+            self.engine.mark(commit, mark)
+            if mark != "skip":
+                self.remember_blobs(commit, mark)
+            elif entry.get("by") == "prescreen" and entry.get("reason", "").startswith(NON_SEMANTIC):
+                parents = graph.parents(graph.index[commit])
+                if parents:
+                    self.same_as[commit] = graph.shas[parents[0]]
+                    self.followers.setdefault(graph.shas[parents[0]], []).append(commit)
+            count += 1
+        return count
+
+    def resume_baseline(self, entries):
+        # The next step diffs against the last commit the journal marked,
+        # as it would have in the interrupted session, not against the root.
+        graph = self.engine.graph
+        for entry in reversed(entries):
+            if entry["mark"] != "skip" and entry["commit"] in graph.index:
+                self.previous_commit = entry["commit"]
+                self.previous_files = self.repo.read_targets(self.previous_commit)
+                return
+
+    def recall(self):
+        # Goods first, then bads from the newest down (topological order), so
+        # the engine ends up holding the nearest bad. Marks the range already
+        # rules out are left.
+        graph = self.engine.graph
+        marks = {sha: mark for sha, mark in self.memory.recall().items() if sha in graph.index}
+        order = sorted(marks, key=lambda sha: (marks[sha] == "bad", graph.index[sha]))
+        recalled = 0
+        for sha in order:
+            if self.engine.is_candidate(sha):
+                self.record(sha, marks[sha], "memory")
+                recalled += 1
+        if recalled:
+            print(f"Recalled {recalled} marks from earlier sessions on the same problem "
+                  f"(roughly {self.engine.steps_left()} steps left)")
+
+    def apply_prescreen(self, head_commit):
+        graph = self.engine.graph
+        screens = Prescreener(self.repo, self.prescreen_workers).screen(graph)
+        inherits_good = []
+        for sha, (status, reason) in screens.items():
+            if status == NON_SEMANTIC:
+                parents = graph.parents(graph.index[sha])
+                if parents:
+                    self.same_as[sha] = graph.shas[parents[0]]
+                    self.followers.setdefault(graph.shas[parents[0]], []).append(sha)
+                else:
+                    inherits_good.append(sha)
+            if sha != head_commit:
+                self.record(sha, "skip", "prescreen", reason=f"{status}: {reason}")
+        broken = sum(1 for status, _ in screens.values() if status != NON_SEMANTIC)
+        print(f"Prescreen: {len(screens) - broken} non-semantic and {broken} syntax-broken commits "
+              f"will not be summarized.")
+        for sha in inherits_good:
+            self.record(sha, "good", "prescreen", reason="no semantic change since the good boundary")
+        self.propagate(head_commit, "bad")
+
+    def propagate(self, commit, mark):
+        # A non-semantic commit behaves exactly like its parent: good flows
+        # down to such children, bad flows up to the parent. Runs of such
+        # commits can be thousands long, so this walks a worklist.
+        pending = deque([commit])
+        while pending:
+            commit = pending.popleft()
+            if mark == "good":
+                targets = [(child, f"no semantic change since {commit}") for child in self.followers.get(commit, ())]
+            elif mark == "bad" and commit in self.same_as:
+                targets = [(self.same_as[commit], f"no semantic change until {commit}")]
+            else:
+                targets = []
+            for target, reason in targets:
+                if self.engine.is_candidate(target):
+                    self.store(target, mark, "prescreen", reason=reason)
+                    pending.append(target)
+
+    def auto_mark(self, summary):
+        if not summary:
+            return None, None
+        try:
+            verdict = parse_verdict(summary)
+        except VerdictError as e:
+            if self.auto_threshold is not None:
+                print(f"[Verdict not usable for auto-marking: {e}]")
+            return None, None
+        if self.auto_threshold is None:
+            return None, verdict
+        if verdict.has_compile_error:
+            print("Model reports a compile error at this commit, asking for a human decision.")
+            return None, verdict
+        if verdict.behaviour_confidence < self.auto_threshold:
+            return None, verdict
+        return verdict.bisect_mark, verdict
+
+    def record(self, commit, mark, by, verdict=None, **extra):
+        self.store(commit, mark, by, verdict, **extra)
+        self.propagate(commit, mark)
+
+    def store(self, commit, mark, by, verdict=None, **extra):
+        self.engine.mark(commit, mark)
+        if mark != "skip":
+            self.remember_blobs(commit, mark)
+        if self.journal is not None:
+            self.journal.append(commit, mark, by, verdict, **extra)
+        if self.memory is not None and by != "memory":
+            self.memory.remember(commit, mark, by)
+
+    def remember_blobs(self, commit, mark):
+        # The same target content marked both ways (a flaky test, an
+        # ancestor-only regression) cannot decide anything by itself.
+        blobs = self.repo.target_blobs(commit)
+        known = self.known_blobs.get(blobs)
+        if known is None:
+            self.known_blobs[blobs] = mark
+        elif known != mark and known != BLOB_CONFLICT:
+            print(f"Target content of {commit} was already marked {known}, no longer auto-marking it")
+            self.known_blobs[blobs] = BLOB_CONFLICT
+
+    def report_first_bad(self):
+        suspects = self.engine.suspects()
+        if len(suspects) > 1:
+            print("There are only 'skip'ped commits left to test.\nThe first bad commit could be any of:")
+            for sha in suspects:
+                print(sha)
+            return
+        first_bad = self.engine.first_bad()
+        commit = self.repo.objects.commit(first_bad)
+        print(f"{first_bad} is the first bad commit")
+        if commit:
+            print(f"Author: {commit.get('author', '')}\n\n{commit['message']}")
+
+    def recall_git(self, head_commit, root_commit):
+        # Same as `git bisect replay`, with the marks taken from memory.
+        marks = self.memory.recall()
+        in_range, _, _ = self.repo.run_cmd(f"git rev-list {head_commit} --not {root_commit}")
+        for sha in in_range.split():
+            if sha not in marks:
+                continue
+            output, _, _ = self.repo.run_cmd(f"git bisect {marks[sha]} {sha}")
+            if self.journal is not None:
+                self.journal.append(sha, marks[sha], "memory")
+            if "first bad commit" in output:
+                print(output)
+                return True
+        return False
+
+    def run_git(self):
         head_commit, _, _ = self.repo.run_cmd("git rev-parse HEAD")
         root_commit, _, _ = self.repo.run_cmd("git rev-list --max-parents=0 HEAD")
 
-        print(f"Starting git bisect from HEAD={head_commit} (bad) to ROOT={root_commit} (good)...")
-        self.repo.run_cmd(f"git bisect start {head_commit} {root_commit}")
+        _, _, bisecting = self.repo.run_cmd("git bisect log")
+        if self.resume and bisecting == 0:
+            print("Resuming the git bisect already in progress in the work directory...")
+        else:
+            print(f"Starting git bisect from HEAD={head_commit} (bad) to ROOT={root_commit} (good)...")
+            self.repo.run_cmd(f"git bisect start {head_commit} {root_commit}")
+            if self.memory is not None and self.recall_git(head_commit, root_commit):
+                return
 
         while True:
             current_commit, _, _ = self.repo.run_cmd("git rev-parse HEAD")
             print(f"Currently at commit: {current_commit}")
-            self.diff_and_summarize()
+            self.diff_and_summarize(current_commit)
 
             choice = self.prompt_user()
             if choice == "c":
                 print("Bisect cancelled by user.")
                 break
 
-            output, _, _ = self.repo.run_cmd(f"git bisect {'good' if choice == 'g' else 'bad'}")
+            mark = 'good' if choice == 'g' else 'bad'
+            output, _, _ = self.repo.run_cmd(f"git bisect {mark}")
+            if self.journal is not None:
+                self.journal.append(current_commit, mark, "human")
+            if self.memory is not None:
+                self.memory.remember(current_commit, mark, "human")
             if "first bad commit" in output:
                 print(output)
                 # output, _, _ = self.repo.run_cmd("git bisect log") # this line shows the log of getting here:
@@ -142,20 +539,78 @@ class GitBisectCLI:
         self.target_path = args.get('target_path', DEFAULT_TARGET_PATH)
         self.repo_url = args.get('repo_url', None)
         self.problem = args.get('problem', None)
+        self.cache_dir = args.get('cache_dir', None)
+        self.engine = args.get('engine', 'graph')
+        self.prune = args.get('prune', '0').lower() in ('1', 'true', 'yes')
+        self.context = int(args.get('context', DEFAULT_CONTEXT))
+        self.verdict_cache = args.get('verdict_cache', None)
+        self.prefetch_budget = int(args.get('prefetch', 20))
+        self.streaming = args.get('stream', '1').lower() in ('1', 'true', 'yes')
+        self.summarizer = args.get('summarizer', None)
+        self.auto_threshold = float(args['auto_threshold']) if 'auto_threshold' in args else None
+        self.journal = args.get('journal', args.get('decision_log', self.default_journal()))
+        self.resume = args.get('resume', '0').lower() in ('1', 'true', 'yes')
+        self.replay = args.get('replay', None)
+        self.prescreen = args.get('prescreen', '0').lower() in ('1', 'true', 'yes')
+        self.prescreen_workers = int(args['prescreen_workers']) if 'prescreen_workers' in args else None
+        self.prior = float(args.get('prior', 0))
+        self.memory = args.get('memory', None)
         print(f"repo_path: {self.repo_path}, target_path: {self.target_path}, repo_url: {self.repo_url}")
 
+    def default_journal(self):
+        # In the mirror cache rather than the user's repository, one per
+        # repository and target so resume=1 finds it again.
+        root = MirrorCache(self.cache_dir).cache_root
+        digest = hashlib.sha1(f"{self.repo_path}\0{self.target_path}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(root, "journals", f"{os.path.basename(self.repo_path) or 'repo'}-{digest}.jsonl")
+
+    def load_journal(self, journal):
+        meta = journal.meta()
+        if meta is None:
+            print(f"Nothing to resume: no session in {journal.path}")
+            sys.exit(1)
+        for key in RESUMED_SETTINGS:
+            if key in meta:
+                setattr(self, key, meta[key])
+        return meta
+
+    def open_memory(self):
+        return open_scope(self.memory, self.repo_url, "llm", problem_signature(self.problem, self.target_path))
+
     def run(self):
-        work_path = os.path.join(self.repo_path, TEMP_DIR_NAME)
-        repo = RepoManager(self.repo_path, self.target_path)
+        journal = Journal(self.journal)
+        meta = self.load_journal(journal) if self.resume else None
+        repo = RepoManager(self.repo_path, self.target_path, MirrorCache(self.cache_dir))
         if not self.repo_url:
             self.repo_url = repo.get_repo_url()
-        repo.sparse_checkout(self.repo_url)
+        if meta and repo.has_worktree():
+            print(f"Reusing work directory: {repo.work_path}")
+            repo.mirror_path = meta.get("mirror_path") or repo.mirrors.mirror_path(self.repo_url)
+        else:
+            repo.sparse_checkout(self.repo_url)
+        if not meta:
+            head_commit, _, _ = repo.run_cmd("git rev-parse HEAD")
+            root_commits, _, _ = repo.run_cmd("git rev-list --max-parents=0 HEAD")
+            journal.start(head=head_commit, roots=root_commits.split(), mirror_path=repo.mirror_path,
+                          **{key: getattr(self, key) for key in RESUMED_SETTINGS})
 
         print(f"Using working repository path: {repo.work_path}")
+        print(f"Journal: {journal.path}")
         print(f"Target file: {repo.target_path}")
 
-        bisect = BisectSession(repo, GPTDiffSummarizer(self.problem))
+        verdicts = VerdictCache(self.verdict_cache)
+        prefetcher = SpeculativePrefetcher(max_workers=2, budget=self.prefetch_budget) if self.prefetch_budget else None
+        summarizer = get_summarizer(self.summarizer, self.problem, cache=verdicts, streaming=self.streaming)
+        bisect = BisectSession(repo, summarizer, engine=self.engine, prune=self.prune,
+                               context=self.context, prefetcher=prefetcher, auto_threshold=self.auto_threshold,
+                               journal=journal, replay=self.replay,
+                               prescreen=self.prescreen, prescreen_workers=self.prescreen_workers,
+                               prior=self.prior, resume=self.resume, memory=self.open_memory())
         bisect.run()
+        print(f"Verdict cache: {verdicts.stats()}")
+        if prefetcher:
+            print(f"Speculative prefetch: {prefetcher.stats()}")
+            prefetcher.shutdown()
 
         revert = input("keep work directory[y/N]: ").strip().lower()
         self.revert = revert == "y"
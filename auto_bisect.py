@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+import queue
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from mark_memory import open_scope, predicate_signature
+from predicate_cache import PredicateCache
+
+
+# Exit codes follow `git bisect run`: 0 good, 125 skip, 1-127 bad, >=128 abort.
+def classify(returncode):
+    if returncode == 0:
+        return "good"
+    if returncode == 125:
+        return "skip"
+    if 0 < returncode < 128:
+        return "bad"
+    raise RuntimeError(f"Predicate aborted with exit code {returncode}")
+
+
+def first_parent_commits(repo_path, good, bad):
+    cmd = ["git", "rev-list", "--first-parent", "--reverse", bad] + [f"^{g}" for g in good]
+    out = subprocess.run(cmd, cwd=repo_path, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return out.split()
+
+
+def parse_cli_args(argv):
+    args = {arg.split('=', 1)[0]: arg.split('=', 1)[1] for arg in argv if '=' in arg}
+    repo_path = os.path.abspath(args.get('repo_path', '.'))
+    bad = args.get('bad', 'HEAD')
+    good = args.get('good')
+    if good:
+        good = good.split(",")
+    else:
+        good = subprocess.run(["git", "rev-list", "--max-parents=0", bad], cwd=repo_path,
+                              stdout=subprocess.PIPE, text=True).stdout.split()
+    timeout = float(args['timeout']) if 'timeout' in args else None
+    return args, repo_path, good, bad, timeout
+
+
+class WorktreePool:
+    def __init__(self, repo_path, size, root=None):
+        self.repo_path = repo_path
+        self.root = root or tempfile.mkdtemp(prefix="bisector-worktrees-")
+        self.paths = []
+        self.free = queue.Queue()
+        for i in range(size):
+            path = os.path.join(self.root, f"wt-{i}")
+            if not os.path.exists(os.path.join(path, ".git")):
+                subprocess.run(["git", "worktree", "add", "--detach", "--no-checkout", path, "HEAD"],
+                               cwd=repo_path, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.paths.append(path)
+            self.free.put(path)
+
+    def acquire(self):
+        return self.free.get()
+
+    def environment(self, path):
+        # Build caches live next to the worktree, one per slot, so checkout and
+        # `git clean` leave them alone and each step only rebuilds what changed.
+        # Predicates can keep a virtualenv or other outputs in BISECTOR_BUILD_CACHE.
+        cache = os.path.join(self.root, "cache", os.path.basename(path))
+        os.makedirs(cache, exist_ok=True)
+        env = dict(os.environ)
+        env.update(BISECTOR_WORKTREE=path, BISECTOR_BUILD_CACHE=cache,
+                   PYTHONPYCACHEPREFIX=os.path.join(cache, "pycache"),
+                   CCACHE_DIR=os.path.join(self.root, "cache", "ccache"))
+        return env
+
+    def release(self, path):
+        self.free.put(path)
+
+    def checkout(self, path, sha):
+        # Untracked-but-ignored files (build outputs, __pycache__) survive between steps.
+        subprocess.run(["git", "checkout", "--detach", "--force", "--quiet", sha], cwd=path, check=True)
+        subprocess.run(["git", "clean", "-fdq"], cwd=path, check=True)
+
+    def close(self):
+        for path in self.paths:
+            subprocess.run(["git", "worktree", "remove", "--force", path], cwd=self.repo_path,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run(["git", "worktree", "prune"], cwd=self.repo_path)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class PredicateRunner:
+    def __init__(self, command, timeout=None, cache=None):
+        self.command = command
+        self.timeout = timeout
+        self.cache = cache
+        self.signature = predicate_signature(command) if cache is not None else None
+        self.runs = 0
+        self.lock = threading.Lock()
+
+    def run(self, pool, sha):
+        key = self.cache.key(pool.repo_path, sha, self.signature) if self.cache is not None else None
+        if key is not None:
+            mark = self.cache.get(key)
+            if mark is not None:
+                return mark, 0.0
+        path = pool.acquire()
+        try:
+            pool.checkout(path, sha)
+            cur = time.time()
+            try:
+                result = subprocess.run(self.command, cwd=path, shell=True, env=pool.environment(path),
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=self.timeout)
+                mark = classify(result.returncode)
+                if key is not None:
+                    self.cache.put(key, mark, time.time() - cur)
+            except subprocess.TimeoutExpired:
+                mark = "skip"
+            with self.lock:
+                self.runs += 1
+            return mark, time.time() - cur
+        finally:
+            pool.release(path)
+
+
+# Tests k split points of the range at once, one worktree each, then recurses
+# into the segment holding the first bad commit: about log_(k+1)(n) rounds.
+class KaryBisector:
+    def __init__(self, repo_path, command, good, bad, k=None, timeout=None, pool_root=None, memory=None,
+                 cache=None):
+        self.repo_path = repo_path
+        self.good = good if isinstance(good, list) else [good]
+        self.bad = bad
+        self.k = k or os.cpu_count() or 1
+        self.runner = PredicateRunner(command, timeout, cache)
+        self.pool_root = pool_root
+        self.memory = memory
+        self.skipped = set()
+        self.rounds = 0
+
+    def candidates(self):
+        return first_parent_commits(self.repo_path, self.good, self.bad)
+
+    def recall(self, commits, lo, hi):
+        marks = self.memory.recall()
+        bad = [p for p, sha in enumerate(commits) if marks.get(sha) == "bad"]
+        if bad:
+            hi = min(hi, min(bad))
+        good = [p for p, sha in enumerate(commits) if marks.get(sha) == "good" and p < hi]
+        if good:
+            lo = max(lo, max(good) + 1)
+        return lo, hi
+
+    def split_points(self, lo, hi):
+        untested = [p for p in range(lo, hi) if p not in self.skipped]
+        if len(untested) <= self.k:
+            return untested
+        return sorted({untested[(len(untested) * j) // (self.k + 1)] for j in range(1, self.k + 1)})
+
+    def run(self):
+        commits = self.candidates()
+        if not commits:
+            print("Nothing to bisect: bad commit is reachable from good.")
+            return None
+        lo, hi = 0, len(commits) - 1
+        print(f"Bisecting {len(commits)} first-parent commits with {self.k} parallel worktrees...")
+        if self.memory is not None:
+            lo, hi = self.recall(commits, lo, hi)
+            if (lo, hi) != (0, len(commits) - 1):
+                print(f"Earlier runs of this predicate narrow the range to {hi - lo + 1} commits.")
+
+        pool = WorktreePool(self.repo_path, min(self.k, len(commits)), self.pool_root)
+        try:
+            with ThreadPoolExecutor(max_workers=self.k) as executor:
+                while lo < hi:
+                    points = self.split_points(lo, hi)
+                    if not points:
+                        break
+                    self.rounds += 1
+                    futures = {p: executor.submit(self.runner.run, pool, commits[p]) for p in points}
+                    results = {p: future.result()[0] for p, future in futures.items()}
+                    print(f"Round {self.rounds}: " + ", ".join(f"{commits[p][:10]}={results[p]}" for p in points))
+
+                    for p in points:
+                        if self.memory is not None:
+                            self.memory.remember(commits[p], results[p], "predicate")
+                        if results[p] == "skip":
+                            self.skipped.add(p)
+                    bad_points = [p for p in points if results[p] == "bad"]
+                    if bad_points:
+                        hi = min(bad_points)
+                    good_points = [p for p in points if results[p] == "good" and p < hi]
+                    if good_points:
+                        lo = max(good_points) + 1
+        finally:
+            if self.pool_root is None:
+                pool.close()
+
+        print(f"{self.runner.runs} predicate runs in {self.rounds} rounds.")
+        if self.runner.cache is not None:
+            print(f"Predicate cache: {self.runner.cache.stats()}")
+        if lo < hi:
+            print("There are only 'skip'ped commits left to test.\nThe first bad commit could be any of:")
+            for sha in commits[lo:hi + 1]:
+                print(sha)
+            return None
+        print(f"{commits[hi]} is the first bad commit")
+        return commits[hi]
+
+
+if __name__ == "__main__":
+    args, repo_path, good, bad, timeout = parse_cli_args(sys.argv[1:])
+    memory = open_scope(args.get('memory'), os.path.realpath(repo_path), "predicate",
+                        predicate_signature(args['command']))
+    cache = None
+    if args.get('predicate_cache') not in ('0', 'false', 'no'):
+        paths = [p for p in args.get('paths', '').split(",") if p]
+        cache = PredicateCache(args.get('predicate_cache'), paths or None)
+    KaryBisector(repo_path, args['command'], good, bad, int(args.get('k', 0)) or None, timeout,
+                 pool_root=args.get('pool_root'), memory=memory, cache=cache).run()
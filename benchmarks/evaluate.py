@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from synthetic import make_corpus, load_corpus
+
+
+STRATEGIES = {
+    "plain": {},
+    "prescreen": {"prescreen": True},
+    "prior": {"prior": 0.5},
+    "prescreen+prior": {"prescreen": True, "prior": 0.5},
+}
+# USD per million prompt / completion tokens; models not listed cost nothing.
+PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4": (30.00, 60.00),
+}
+AUTO_THRESHOLD = 60
+
+
+def quiet():
+    # Sessions print every diff and git reports every worktree; the table is
+    # the output that matters.
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+
+def run_case(case, strategy, summarizer_name, scratch, auto_threshold=AUTO_THRESHOLD):
+    # Runs in a worker process: one abisector session against one repo, with
+    # every model call going to whatever OPENAI_BASE_URL names. Verdicts below
+    # auto_threshold go to a "human" who knows the answer, so precision
+    # measures the automatic marks and human steps measure the help needed.
+    from abisector import RepoManager, BisectSession
+    from client_pool import shared_pool
+    from journal import Journal
+    from mirror_cache import MirrorCache
+    from summarizer import get_summarizer
+
+    class OracleSession(BisectSession):
+        def diff_and_summarize(self, commit="HEAD"):
+            self.current = commit
+            return super().diff_and_summarize(commit)
+
+        def prompt_user(self):
+            cmd = ["git", "merge-base", "--is-ancestor", case["first_bad"], self.current]
+            return "b" if subprocess.run(cmd, cwd=self.repo.work_path).returncode == 0 else "g"
+
+    name = f"{case['name']}-{strategy}"
+    work = os.path.join(scratch, name)
+    os.makedirs(work, exist_ok=True)
+    pool = shared_pool()
+    before = pool.stats()
+    started = time.time()
+    repo = RepoManager(work, case["target_path"], MirrorCache(os.path.join(scratch, "mirrors", name)))
+    repo.sparse_checkout("file://" + os.path.abspath(case["repo"]))
+    ready = time.time()
+    summarizer = get_summarizer(summarizer_name, case["problem"], cache=None, streaming=False, pool=pool)
+    journal = Journal(os.path.join(work, "journal.jsonl"))
+    session = OracleSession(repo, summarizer, auto_threshold=auto_threshold, journal=journal, **STRATEGIES[strategy])
+    try:
+        session.run()
+        suspects = session.engine.suspects()
+        found = session.engine.first_bad() if len(suspects) == 1 else None
+    finally:
+        repo.remove_repo()
+    finished = time.time()
+    after = pool.stats()
+    entries = journal.entries()
+    shutil.rmtree(work, ignore_errors=True)
+
+    usage = {k: after.get(k, 0) - before.get(k, 0) for k in ("requests", "prompt_tokens", "completion_tokens")}
+    price = PRICES.get(summarizer.model, (0.0, 0.0))
+    return {
+        "case": case["name"],
+        "strategy": strategy,
+        "commits": case.get("commits"),
+        "expected": case["first_bad"],
+        "found": found,
+        "correct": found == case["first_bad"],
+        "steps": sum(1 for e in entries if e["by"] in ("auto", "human")),
+        "human_steps": sum(1 for e in entries if e["by"] == "human"),
+        "marks": len(entries),
+        "requests": usage["requests"],
+        "tokens": usage["prompt_tokens"] + usage["completion_tokens"],
+        "dollars": (usage["prompt_tokens"] * price[0] + usage["completion_tokens"] * price[1]) / 1e6,
+        "setup_seconds": round(ready - started, 3),
+        "seconds": round(finished - ready, 3),
+    }
+
+
+def summarize(results):
+    by_strategy = {}
+    for r in results:
+        by_strategy.setdefault(r["strategy"], []).append(r)
+    summary = {}
+    for strategy, rows in by_strategy.items():
+        summary[strategy] = {
+            "precision": sum(r["correct"] for r in rows) / len(rows),
+            "mean_steps": sum(r["steps"] for r in rows) / len(rows),
+            "mean_human_steps": sum(r["human_steps"] for r in rows) / len(rows),
+            "tokens": sum(r["tokens"] for r in rows),
+            "dollars": round(sum(r["dollars"] for r in rows), 6),
+            "seconds": round(sum(r["seconds"] for r in rows), 3),
+        }
+    return summary
+
+
+def main():
+    args = dict(arg.split('=', 1) for arg in sys.argv[1:] if '=' in arg)
+    strategies = args.get('strategies', ",".join(STRATEGIES)).split(",")
+    summarizer_name = args.get('summarizer', 'gpt')
+    workers = int(args.get('workers', os.cpu_count() or 1))
+    auto_threshold = float(args.get('auto_threshold', AUTO_THRESHOLD))
+    scratch = tempfile.mkdtemp(prefix="bisector-eval-")
+    mock = None
+    try:
+        if args.get('corpus'):
+            corpus = load_corpus(args['corpus'])
+        else:
+            corpus = make_corpus(os.path.join(scratch, "corpus"), int(args.get('cases', 8)), int(args.get('seed', 0)))
+        if args.get('live', '0').lower() not in ('1', 'true', 'yes'):
+            from mock_llm_server import MockLLMServer
+            mock = MockLLMServer(latency=float(args.get('latency', 0))).start()
+            os.environ["OPENAI_BASE_URL"] = os.environ["OPENROUTER_BASE_URL"] = mock.url
+            os.environ.setdefault("OPENAI_API_KEY", "mock")
+            os.environ.setdefault("OPENROUTER_API_KEY", "mock")
+        print(f"Evaluating {len(corpus)} repos x {len(strategies)} strategies with '{summarizer_name}' "
+              f"on {'the mock server' if mock else 'live endpoints'}...")
+
+        started = time.time()
+        # Spawned, not forked: the parent is running the mock server's threads.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=quiet) as executor:
+            futures = [executor.submit(run_case, case, strategy, summarizer_name, scratch, auto_threshold)
+                       for case in corpus for strategy in strategies]
+            results = [future.result() for future in futures]
+
+        print(f"{'case':10} {'strategy':16} {'commits':>7} {'ok':>3} {'steps':>5} {'human':>5} {'tokens':>7} "
+              f"{'$':>9} {'seconds':>8}")
+        for r in results:
+            print(f"{r['case']:10} {r['strategy']:16} {r['commits'] or '':>7} {'yes' if r['correct'] else 'NO':>3} "
+                  f"{r['steps']:>5} {r['human_steps']:>5} {r['tokens']:>7} {r['dollars']:>9.5f} {r['seconds']:>8.2f}")
+        summary = summarize(results)
+        for strategy, s in summary.items():
+            print(f"{strategy}: precision {s['precision']:.0%}, {s['mean_steps']:.1f} steps "
+                  f"({s['mean_human_steps']:.1f} human) per repo, "
+                  f"{s['tokens']} tokens, ${s['dollars']:.4f}, {s['seconds']:.1f}s")
+        print(f"Wall clock: {time.time() - started:.1f}s")
+
+        report = {"summarizer": summarizer_name, "summary": summary, "results": results}
+        if args.get('out'):
+            with open(args['out'], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        if "--json" in sys.argv:
+            print(json.dumps(report, indent=2))
+        floor = float(args.get('min_precision', 0))
+        return 0 if all(s["precision"] >= floor for s in summary.values()) else 1
+    finally:
+        if mock is not None:
+            mock.stop()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from synthetic import fast_import, large_history, TARGET_PATH
+
+
+# Generated once per profile and kept under cache_dir, since the larger
+# ones take a while to build.
+PROFILES = {
+    "deep-10k": {"commits": 10_000, "files": 100, "target_every": 10, "blob_bytes": 2_000},
+    "deep-100k": {"commits": 100_000, "files": 100, "target_every": 10, "blob_bytes": 2_000},
+    "wide-20k-files": {"commits": 10_000, "files": 20_000, "target_every": 10, "blob_bytes": 2_000},
+    "big-blob": {"commits": 10_000, "files": 100, "target_every": 50, "blob_bytes": 1_000_000},
+}
+DEFAULT_PROFILES = ("deep-10k", "wide-20k-files", "big-blob")
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bisector", "bench-repos")
+CULPRIT_AT = 0.7
+RUNS = 5
+READS = 50
+# A metric more than this many times slower than its baseline is a regression.
+TOLERANCE = 1.25
+
+
+def timed(fn, runs=RUNS):
+    samples = []
+    for _ in range(runs):
+        cur = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - cur)
+    return statistics.median(samples)
+
+
+@contextlib.contextmanager
+def silenced():
+    # Sessions print every diff and git reports every worktree it prepares.
+    sys.stdout.flush()
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for fd in saved + [devnull]:
+            os.close(fd)
+
+
+def build(profile, cache_dir):
+    spec = PROFILES[profile]
+    path = os.path.join(cache_dir, profile)
+    manifest = os.path.join(cache_dir, f"{profile}.json")
+    if os.path.exists(manifest):
+        with open(manifest, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["spec"] == spec:
+            return meta
+    shutil.rmtree(path, ignore_errors=True)
+    culprit = int(spec["commits"] * CULPRIT_AT)
+    cur = time.perf_counter()
+    shas = fast_import(path, large_history(spec["commits"], spec["files"], spec["target_every"],
+                                           spec["blob_bytes"], culprit))
+    meta = {"profile": profile, "spec": spec, "repo": path, "shas": shas, "culprit": culprit,
+            "build_seconds": time.perf_counter() - cur}
+    with open(manifest, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+# Stands in for the model so a session step costs only the git layer.
+class StubSummarizer:
+    problem = None
+
+    def summarize(self, diff_text):
+        return ""
+
+    def analyse(self, diff_text):
+        return ""
+
+
+def measure(meta, scratch):
+    from abisector import RepoManager, BisectSession
+    from bisect_engine import BisectEngine
+    from mirror_cache import MirrorCache
+
+    shas, culprit = meta["shas"], meta["culprit"]
+    position = {sha: k for k, sha in enumerate(shas)}
+    url = "file://" + os.path.abspath(meta["repo"])
+    cache = MirrorCache(os.path.join(scratch, "mirrors"))
+    work = os.path.join(scratch, meta["profile"])
+    os.makedirs(work, exist_ok=True)
+    repo = RepoManager(work, TARGET_PATH, cache)
+    results = {}
+
+    with silenced():
+        cur = time.perf_counter()
+        repo.sparse_checkout(url)
+        results["sparse_checkout_cold"] = time.perf_counter() - cur
+        results["sparse_checkout_warm"] = timed(lambda: repo.sparse_checkout(url), runs=1)
+
+        results["run_cmd"] = timed(lambda: repo.run_cmd("git rev-parse HEAD"), runs=20)
+        results["rev_list_count"] = timed(lambda: repo.run_cmd("git rev-list --count HEAD"))
+        head, root = shas[-1], shas[0]
+        results["engine_load"] = timed(lambda: BisectEngine.load(repo.work_path, head, [root]))
+        results["engine_load_pruned"] = timed(lambda: BisectEngine.load(repo.work_path, head, [root], repo.pathspecs()))
+
+        sample = random.Random(0).sample(shas, min(READS, len(shas)))
+        repo.close()
+        cur = time.perf_counter()
+        for sha in sample:
+            repo.read_targets(sha)
+        results["read_targets_cold"] = (time.perf_counter() - cur) / len(sample)
+        cur = time.perf_counter()
+        for sha in sample:
+            repo.read_targets(sha)
+        results["read_targets_warm"] = (time.perf_counter() - cur) / len(sample)
+
+        engine = BisectEngine.load(repo.work_path, head, [root])
+        steps, cur = 0, time.perf_counter()
+        while (sha := engine.next_commit()) is not None:
+            engine.mark(sha, "bad" if position[sha] >= culprit else "good")
+            steps += 1
+        results["engine_step"] = (time.perf_counter() - cur) / max(steps, 1)
+        results["engine_steps"] = steps
+
+        class OracleSession(BisectSession):
+            def diff_and_summarize(self, commit="HEAD"):
+                self.current = commit
+                return super().diff_and_summarize(commit)
+
+            def prompt_user(self):
+                return "b" if position[self.current] >= culprit else "g"
+
+        repo.close()
+        session = OracleSession(repo, StubSummarizer())
+        cur = time.perf_counter()
+        session.run()
+        results["session_run"] = time.perf_counter() - cur
+        found = session.engine.first_bad()
+        session_steps = sum(1 for _, mark in session.engine.marks if mark != "skip")
+        results["session_step"] = results["session_run"] / max(session_steps, 1)
+        results["session_steps"] = session_steps
+
+        repo.run_cmd(f"git bisect start {head} {root}")
+        steps, cur = 0, time.perf_counter()
+        while True:
+            sha, _, _ = repo.run_cmd("git rev-parse HEAD")
+            output, _, _ = repo.run_cmd(f"git bisect {'bad' if position[sha] >= culprit else 'good'}")
+            steps += 1
+            if "first bad commit" in output or steps > 64:
+                break
+        results["git_bisect_step"] = (time.perf_counter() - cur) / steps
+        repo.run_cmd("git bisect reset")
+        repo.remove_repo()
+
+    if found != shas[culprit]:
+        raise RuntimeError(f"{meta['profile']}: session found {found}, expected {shas[culprit]}")
+    return results
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    regressions = []
+    for profile, metrics in report["profiles"].items():
+        old = baseline["profiles"].get(profile)
+        if old is None:
+            continue
+        for name, value in metrics.items():
+            before = old.get(name)
+            if not isinstance(value, float) or not before:
+                continue
+            ratio = value / before
+            flag = "  REGRESSION" if ratio > tolerance else ""
+            print(f"{profile:16} {name:22} {before:10.5f}s -> {value:10.5f}s  x{ratio:.2f}{flag}")
+            if flag:
+                regressions.append((profile, name, ratio))
+    return regressions
+
+
+def main():
+    args = dict(arg.split('=', 1) for arg in sys.argv[1:] if '=' in arg)
+    profiles = args['profiles'].split(",") if 'profiles' in args else list(DEFAULT_PROFILES)
+    cache_dir = args.get('cache_dir', DEFAULT_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              stdout=subprocess.PIPE, text=True).stdout.strip()
+    report = {"revision": revision, "python": platform.python_version(), "machine": platform.platform(),
+              "git": subprocess.run(["git", "--version"], stdout=subprocess.PIPE, text=True).stdout.strip(),
+              "profiles": {}}
+
+    for profile in profiles:
+        meta = build(profile, cache_dir)
+        print(f"{profile}: {len(meta['shas'])} commits, {meta['spec']['files']} files, "
+              f"target ~{meta['spec']['blob_bytes']} bytes (built in {meta['build_seconds']:.1f}s)")
+        scratch = tempfile.mkdtemp(prefix="bisector-bench-")
+        try:
+            results = measure(meta, scratch)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        for name, value in results.items():
+            print(f"  {name:22} {value:10.5f}s" if isinstance(value, float) else f"  {name:22} {value:10d}")
+        report["profiles"][profile] = results
+
+    if args.get('save'):
+        with open(args['save'], "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args['save']}")
+    if args.get('compare'):
+        with open(args['compare'], encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {args['compare']} (revision {baseline.get('revision')}):")
+        regressions = compare(report, baseline, float(args.get('tolerance', TOLERANCE)))
+        if regressions:
+            print(f"{len(regressions)} metrics regressed beyond x{float(args.get('tolerance', TOLERANCE)):.2f}")
+            return 1
+    if "--json" in sys.argv:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
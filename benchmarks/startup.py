@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+
+# Wall-clock seconds for a fresh interpreter to import each entry point, and
+# its peak RSS in MB. Over budget means a heavy import crept back in.
+BUDGETS = {
+    "abisector": {"seconds": 0.5, "rss_mb": 60},
+    "webui": {"seconds": 1.5, "rss_mb": 120},
+}
+
+PROBE = (
+    "import sys, time, json, resource\n"
+    "t = time.perf_counter()\n"
+    "import {module}\n"
+    "elapsed = time.perf_counter() - t\n"
+    "rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+    "rss_mb = rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024\n"
+    "print(json.dumps({{'import_seconds': elapsed, 'rss_mb': rss_mb, "
+    "'heavy': [m for m in ('torch', 'transformers', 'accelerate', 'openai') if m in sys.modules]}}))\n"
+)
+
+
+def measure(module, runs=RUNS):
+    walls, imports, rss, heavy = [], [], [], []
+    for _ in range(runs):
+        cur = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], cwd=REPO_ROOT,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        walls.append(time.perf_counter() - cur)
+        if result.returncode != 0:
+            return {"error": result.stderr.strip().splitlines()[-1]}
+        probe = json.loads(result.stdout)
+        imports.append(probe["import_seconds"])
+        rss.append(probe["rss_mb"])
+        heavy = probe["heavy"]
+    return {
+        "seconds": statistics.median(walls),
+        "import_seconds": statistics.median(imports),
+        "rss_mb": max(rss),
+        "heavy_modules": heavy,
+    }
+
+
+def main():
+    report, failed = {}, False
+    for module, budget in BUDGETS.items():
+        result = measure(module)
+        result["budget"] = budget
+        if "error" in result:
+            print(f"{module}: could not import ({result['error']})")
+        else:
+            over = [k for k in ("seconds", "rss_mb") if result[k] > budget[k]]
+            result["over_budget"] = over
+            failed = failed or bool(over) or bool(result["heavy_modules"])
+            print(f"{module}: {result['seconds']:.3f}s (import {result['import_seconds']:.3f}s), "
+                  f"{result['rss_mb']:.0f} MB, heavy imports: {result['heavy_modules'] or 'none'}"
+                  + (f"  OVER BUDGET: {', '.join(over)}" if over else ""))
+        report[module] = result
+    if "--json" in sys.argv:
+        print(json.dumps(report, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
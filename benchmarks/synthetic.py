@@ -0,0 +1,153 @@
+import os
+import json
+import random
+import subprocess
+
+
+MARKER = "BUG"
+TARGET_PATH = "app.py"
+PROBLEM = f"g() started returning {MARKER} instead of its argument"
+AUTHOR = "Synthetic <synthetic@example.com>"
+EPOCH = 1700000000
+KINDS = ("sem", "sem", "comment", "ws", "doc", "other")
+
+
+def fast_import(path, commits, branch="master"):
+    # Builds a linear history with `git fast-import` and returns the commit
+    # shas in order. `commits` yields (message, {path: content or None}).
+    os.makedirs(path, exist_ok=True)
+    subprocess.run(["git", "init", "-q", "-b", branch], cwd=path, check=True)
+    subprocess.run(["git", "config", "uploadpack.allowFilter", "true"], cwd=path, check=True)
+    marks = os.path.join(path, ".git", "synthetic-marks")
+    proc = subprocess.Popen(["git", "fast-import", "--quiet", f"--export-marks={marks}"], cwd=path,
+                            stdin=subprocess.PIPE)
+    count = 0
+    for count, (message, files) in enumerate(commits, 1):
+        out = [f"commit refs/heads/{branch}\nmark :{count}\n"
+               f"committer {AUTHOR} {EPOCH + count * 60} +0000\n".encode("utf-8"), data(message)]
+        if count > 1:
+            out.append(f"from :{count - 1}\n".encode("utf-8"))
+        for name, content in files.items():
+            if content is None:
+                out.append(f"D {name}\n".encode("utf-8"))
+            else:
+                out.append(f"M 100644 inline {name}\n".encode("utf-8") + data(content))
+        out.append(b"\n")
+        proc.stdin.write(b"".join(out))
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise RuntimeError(f"git fast-import failed in {path}")
+    subprocess.run(["git", "checkout", "-q", "-f", branch], cwd=path, check=True)
+    with open(marks, encoding="utf-8") as f:
+        shas = dict(line.split() for line in f)
+    return [shas[f":{k}"] for k in range(1, count + 1)]
+
+
+def data(content):
+    raw = content.encode("utf-8") if isinstance(content, str) else content
+    return f"data {len(raw)}\n".encode("utf-8") + raw + b"\n"
+
+
+def regression_history(commits, culprit, seed=0, decoy=None, broken=None):
+    # One Python file grows function by function; commit `culprit` makes g()
+    # return the marker. Noise commits only touch comments, whitespace,
+    # docstrings or another file. A `decoy` commit adds a comment naming the
+    # marker and the next one drops it again; a `broken` commit leaves a
+    # syntax error that the next one fixes.
+    rng = random.Random(seed)
+    funcs = ["def f0(x):\n    return x\n", "def g(x):\n    return x\n"]
+    readme = ""
+
+    def app(extra=""):
+        return "\n\n".join(funcs) + extra
+
+    yield "initial version", {TARGET_PATH: app(), "README": "synthetic regression\n"}
+    for i in range(1, commits):
+        kind = rng.choice(KINDS)
+        if i == culprit:
+            kind = "bug"
+        elif decoy is not None and i in (decoy, decoy + 1):
+            kind = "decoy" if i == decoy else "undecoy"
+        elif broken is not None and i in (broken, broken + 1):
+            kind = "broken" if i == broken else "fix"
+        files = {}
+        if kind == "sem":
+            funcs.append(f"def f{i}(x):\n    return x + {i}\n")
+        elif kind == "comment":
+            funcs[-1] += f"# note {i}\n"
+        elif kind == "ws":
+            funcs[-1] += "\n"
+        elif kind == "doc":
+            funcs[0] = funcs[0].replace("def f0(x):\n", f"def f0(x):\n    \"\"\"Revision {i}.\"\"\"\n", 1) \
+                if '"""' not in funcs[0] else funcs[0].replace('"""Revision', '"""Rev.', 1)
+        elif kind == "other":
+            readme += f"change {i}\n"
+            files["README"] = "synthetic regression\n" + readme
+        elif kind == "bug":
+            funcs[1] = f"def g(x):\n    return {MARKER!r}\n"
+        elif kind == "decoy":
+            funcs[-1] += f"# tracked as {MARKER}-{i} upstream\n"
+        elif kind == "undecoy":
+            funcs[-1] = funcs[-1].replace(f"# tracked as {MARKER}-{decoy} upstream\n", "")
+        if kind == "broken":
+            files[TARGET_PATH] = app("\ndef oops(:\n")
+        elif kind != "other":
+            files[TARGET_PATH] = app()
+        yield f"{kind} {i}", files
+
+
+def make_case(root, name, commits, culprit, seed=0, decoy=None, broken=None):
+    path = os.path.join(root, name)
+    shas = fast_import(path, regression_history(commits, culprit, seed, decoy, broken))
+    case = {"name": name, "repo": path, "target_path": TARGET_PATH, "problem": PROBLEM,
+            "first_bad": shas[culprit], "commits": commits}
+    with open(os.path.join(root, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(case, f, indent=2)
+    return case
+
+
+def make_corpus(root, cases=8, seed=0):
+    # Sizes from 30 to a few hundred commits; every other case has a decoy
+    # before the culprit and every third a syntax-broken stretch.
+    rng = random.Random(seed)
+    corpus = []
+    for k in range(cases):
+        commits = rng.choice((30, 60, 120, 250, 400))
+        culprit = rng.randrange(3, commits - 2)
+        decoy = rng.randrange(1, culprit - 1) if k % 2 and culprit > 3 else None
+        broken = rng.randrange(1, commits - 1) if k % 3 == 2 else None
+        if broken in (culprit, culprit - 1) or (decoy is not None and broken in (decoy - 1, decoy, decoy + 1)):
+            broken = None
+        corpus.append(make_case(root, f"case-{k:02d}", commits, culprit, seed + k, decoy, broken))
+    return corpus
+
+
+def load_corpus(root):
+    # Any <name>.json with repo, target_path, problem and first_bad is a case,
+    # so hand-made regressions can sit next to generated ones.
+    corpus = []
+    for name in sorted(os.listdir(root)):
+        if name.endswith(".json"):
+            with open(os.path.join(root, name), encoding="utf-8") as f:
+                corpus.append(json.load(f))
+    return corpus
+
+
+def large_history(commits, files, target_every, blob_bytes, culprit, target=TARGET_PATH):
+    # Scaling fixture: `files` small files, one of which changes per commit,
+    # plus a target of about `blob_bytes` rewritten every `target_every`
+    # commits. From commit `culprit` on, the target carries the marker.
+    filler = "".join(f"value_{k:08d} = {k * 7919 % 1000003}\n" for k in range(max(1, blob_bytes // 26)))
+
+    def target_text(i):
+        return f"REVISION = {i}\n" + filler + (f"STATUS = {MARKER!r}\n" if i >= culprit else "")
+
+    tree = {f"pkg/d{k % 100:02d}/f{k:06d}.txt": f"{k}\n" for k in range(files)}
+    tree[target] = target_text(0)
+    yield "initial tree", tree
+    names = sorted(name for name in tree if name != target)
+    for i in range(1, commits):
+        changes = {names[i % len(names)]: f"{i}\n"}
+        if i % target_every == 0 or i == culprit:
+            changes[target] = target_text(i)
+        yield f"commit {i}", changes
@@ -0,0 +1,239 @@
+import subprocess
+from array import array
+from itertools import compress
+
+
+# bin() digits to compress() selectors.
+BIT_SELECTORS = bytes.maketrans(b"01", b"\0\1")
+
+
+# Ancestry between the good and bad commits, loaded once from
+# `git rev-list --topo-order --parents`. Index 0 is the bad commit and every
+# parent has a larger index than its children.
+class CommitGraph:
+    def __init__(self, shas, parents):
+        self.shas = shas
+        self.index = {sha: i for i, sha in enumerate(shas)}
+        self.parent_start = array("i", [0])
+        self.parent_idx = array("i")
+        for plist in parents:
+            for p in plist:
+                if p in self.index:
+                    self.parent_idx.append(self.index[p])
+            self.parent_start.append(len(self.parent_idx))
+        self.linear = all(list(self.parents(i)) == [i + 1] for i in range(len(shas) - 1))
+
+    @classmethod
+    def load(cls, repo_path, bad, goods, paths=None):
+        cmd = ["git", "rev-list", "--topo-order", "--parents", bad] + [f"^{g}" for g in goods]
+        if paths:
+            cmd += ["--"] + list(paths)
+        result = subprocess.run(cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"git rev-list failed: {result.stderr.strip()}")
+        shas, parents = [], []
+        for line in result.stdout.splitlines():
+            fields = line.split()
+            shas.append(fields[0])
+            parents.append(fields[1:])
+        if paths and (not shas or shas[0] != bad):
+            # The bad commit itself may not touch the paths; hang it above the
+            # simplified history so index 0 is still the bad commit.
+            referenced = {p for plist in parents for p in plist}
+            shas.insert(0, bad)
+            parents.insert(0, [sha for sha in shas[1:] if sha not in referenced])
+        return cls(shas, parents)
+
+    def __len__(self):
+        return len(self.shas)
+
+    def parents(self, i):
+        return self.parent_idx[self.parent_start[i]:self.parent_start[i + 1]]
+
+    def walk(self, i, keep):
+        # Indices reachable from i through parents for which keep(p) holds.
+        seen, stack = {i}, [i]
+        while stack:
+            for p in self.parents(stack.pop()):
+                if p not in seen and keep(p):
+                    seen.add(p)
+                    stack.append(p)
+        return seen
+
+    def ancestors(self, i, stop=0):
+        # Bitmask of i and everything reachable from it inside the graph,
+        # leaving out `stop`, which must hold all ancestors of its members.
+        if stop >> i & 1:
+            return 0
+        if self.linear:
+            return ((1 << len(self.shas)) - 1) >> i << i & ~stop
+        stopped = set(bit_indices(stop))
+        return index_mask(self.walk(i, lambda p: p not in stopped), len(self.shas))
+
+
+def mass(mask, weights):
+    # Sum of weights[k] over the set bits k of mask.
+    return sum(compress(weights, bin(mask)[:1:-1].encode().translate(BIT_SELECTORS)))
+
+
+def bit_indices(mask):
+    return [i for i, bit in enumerate(bin(mask)[:1:-1]) if bit == "1"]
+
+
+def index_mask(indices, n):
+    bits = bytearray(n // 8 + 1)
+    for i in indices:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, "little")
+
+
+# Checkout-free equivalent of `git bisect good/bad/skip` over a CommitGraph.
+# With weights (prior probability of each commit being the first bad one)
+# next_commit splits the remaining probability mass in half instead of the
+# remaining commit count.
+class BisectEngine:
+    def __init__(self, graph):
+        self.graph = graph
+        self.candidates = (1 << len(graph)) - 1
+        # Ancestors of the good commits; no walk needs to enter them again.
+        self.cleared = 0
+        self.bad = 0
+        self.skipped = set()
+        self.marks = []
+        self.weights = None
+        self.suffix = None
+
+    def set_weights(self, prior, default=0.0):
+        self.weights = [max(float(prior.get(sha, default)), 0.0) for sha in self.graph.shas]
+        if not any(self.weights):
+            self.weights = None
+            self.suffix = None
+            return
+        if self.graph.linear:
+            # suffix[i] = weight of commits i.. so any linear range sums in O(1)
+            self.suffix = [0.0] * (len(self.weights) + 1)
+            for i in range(len(self.weights) - 1, -1, -1):
+                self.suffix[i] = self.suffix[i + 1] + self.weights[i]
+
+    @classmethod
+    def load(cls, repo_path, bad, goods, paths=None):
+        return cls(CommitGraph.load(repo_path, bad, goods, paths))
+
+    def copy(self):
+        other = BisectEngine(self.graph)
+        other.candidates = self.candidates
+        other.cleared = self.cleared
+        other.bad = self.bad
+        other.skipped = set(self.skipped)
+        other.marks = list(self.marks)
+        other.weights = self.weights
+        other.suffix = self.suffix
+        return other
+
+    def mark(self, sha, mark):
+        i = self.graph.index.get(sha)
+        if i is None:
+            return
+        if mark == "good":
+            cleared = self.graph.ancestors(i, self.cleared)
+            self.cleared |= cleared
+            self.candidates &= ~cleared
+        elif mark == "bad":
+            self.candidates &= self.graph.ancestors(i, self.cleared)
+            self.bad = i
+        elif mark == "skip":
+            self.skipped.add(i)
+        else:
+            raise ValueError(f"Unknown bisect mark: {mark}")
+        self.marks.append((sha, mark))
+
+    def is_candidate(self, sha):
+        i = self.graph.index.get(sha)
+        return i is not None and bool(self.candidates >> i & 1)
+
+    def remaining(self):
+        return bit_indices(self.candidates)
+
+    def _testable(self):
+        return [i for i in self.remaining() if i != self.bad and i not in self.skipped]
+
+    def next_commit(self):
+        testable = self._testable()
+        if not testable:
+            return None
+        if self.weights is not None:
+            total, weight = self.weighted_split()
+        elif self.graph.linear:
+            total = self.candidates.bit_count()
+            hi = self.candidates.bit_length() - 1
+            weight = lambda i: hi - i + 1
+        else:
+            total = self.candidates.bit_count()
+            weight = self.reach().get
+        best, best_score = None, -1
+        for i in testable:
+            w = weight(i)
+            score = min(w, total - w)
+            if score > best_score:
+                best, best_score = i, score
+        return self.graph.shas[best]
+
+    def reach(self, weights=None):
+        # Weight (by default the number) of each candidate's ancestors among
+        # the candidates. Walks the candidates oldest first with bitmasks
+        # over their ranks, keeping a mask only until its last candidate
+        # child has used it, so memory follows the width of the graph rather
+        # than its length. A commit adds its own weight to its first
+        # parent's; only the commits a merge brings in beyond that are summed.
+        remaining = self.remaining()
+        rank = {i: k for k, i in enumerate(remaining)}
+        parents = {i: [rank[p] for p in self.graph.parents(i) if p in rank] for i in remaining}
+        own = None if weights is None else memoryview(array("d", [weights[i] for i in remaining]))
+        children = [0] * len(remaining)
+        for plist in parents.values():
+            for p in plist:
+                children[p] += 1
+        masks, reach = {}, [0] * len(remaining)
+        for k in range(len(remaining) - 1, -1, -1):
+            first, *rest = parents[remaining[k]] or [None]
+            mask, total = 1 << k, 1 if own is None else own[k]
+            if first is not None:
+                mask |= masks[first]
+                total += reach[first]
+            for p in rest:
+                if own is not None:
+                    total += mass((masks[p] & ~mask) >> k, own[k:])
+                mask |= masks[p]
+            if rest and own is None:
+                total = mask.bit_count()
+            for p in parents[remaining[k]]:
+                children[p] -= 1
+                if not children[p]:
+                    del masks[p]
+            if children[k]:
+                masks[k] = mask
+            reach[k] = total
+        return dict(zip(remaining, reach))
+
+    def weighted_split(self):
+        # weight(i) is the mass that stays a candidate if i turns out bad.
+        if self.suffix is not None:
+            hi = self.candidates.bit_length()
+            return self.suffix[self.bad] - self.suffix[hi], lambda i: self.suffix[i] - self.suffix[hi]
+        return sum(self.weights[i] for i in self.remaining()), self.reach(self.weights).get
+
+    def peek(self, sha, mark):
+        engine = self.copy()
+        engine.mark(sha, mark)
+        return engine.next_commit()
+
+    def first_bad(self):
+        if self._testable():
+            return None
+        return self.graph.shas[self.bad]
+
+    def suspects(self):
+        return [self.graph.shas[i] for i in self.remaining() if i == self.bad or i in self.skipped]
+
+    def steps_left(self):
+        return max(len(self._testable()), 1).bit_length() - 1
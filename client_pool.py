@@ -0,0 +1,254 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+
+
+PROVIDERS = {
+    "openai": {"base_url": None, "base_url_env": "OPENAI_BASE_URL", "key_env": "OPENAI_API_KEY"},
+    "openrouter": {"base_url": "https://openrouter.ai/api/v1", "base_url_env": "OPENROUTER_BASE_URL",
+                   "key_env": "OEPNROUTER_API_KEY"},
+}
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+_SHARED = None
+_SHARED_LOCK = threading.Lock()
+
+
+def parse_duration(value):
+    # Rate-limit headers use "20ms", "1.5s", "6m0s" or bare seconds.
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    return sum(float(n) * units[u] for n, u in parts) if parts else None
+
+
+# Per-provider concurrency gate. Holds at most `limit` requests in flight and,
+# when the provider reports the request budget is (about to be) exhausted,
+# stops admitting new ones until its reset time.
+class RateLimiter:
+    def __init__(self, limit):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.paused_until = 0.0
+
+    async def acquire(self):
+        await self.semaphore.acquire()
+        self.active += 1
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled while paused (a hedge loser, an ensemble quorum):
+                # the slot was never used.
+                self.release()
+                raise
+
+    def release(self):
+        self.active -= 1
+        self.semaphore.release()
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, headers, limited=False):
+        retry_after = parse_duration(headers.get("retry-after"))
+        reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if limited:
+            self.pause(retry_after or reset or 1.0)
+        elif remaining is not None and remaining.isdigit() and int(remaining) < self.active and reset:
+            self.pause(reset)
+        return retry_after or 0.0
+
+
+# One AsyncOpenAI client per provider for the whole process, driven by a
+# private event loop thread so synchronous callers (Flask handlers, summarizer
+# threads) share connections, rate-limit state and retries. A request still
+# running after `hedge_after` seconds, or one that failed outright, is also
+# sent to the `hedge` (provider, model); the first answer wins and the other
+# request is cancelled.
+class ClientPool:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES, timeout=None,
+                 hedge=None, hedge_after=None):
+        import openai
+        from dotenv import load_dotenv
+        load_dotenv()
+        self.openai = openai
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.clients = {}
+        self.limiters = {}
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "retries": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0,
+                         "prompt_tokens": 0, "completion_tokens": 0}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="client-pool", daemon=True)
+        self.thread.start()
+
+    def client(self, provider):
+        # Only touched from the pool's loop thread.
+        if provider not in self.clients:
+            if provider not in PROVIDERS:
+                raise ValueError(f"Unknown provider '{provider}', choose from: {', '.join(sorted(PROVIDERS))}")
+            config = PROVIDERS[provider]
+            base_url = os.getenv(config["base_url_env"]) or config["base_url"]
+            kwargs = {"api_key": os.getenv(config["key_env"]) or "missing", "max_retries": 0}
+            if base_url:
+                kwargs["base_url"] = base_url
+            if self.timeout:
+                kwargs["timeout"] = self.timeout
+            self.clients[provider] = self.openai.AsyncOpenAI(**kwargs)
+            self.limiters[provider] = RateLimiter(self.max_concurrency)
+        return self.clients[provider], self.limiters[provider]
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def retry_delay(self, error, attempt, limiter):
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(error, self.openai.APIStatusError):
+            if error.status_code not in RETRY_STATUSES:
+                return None
+            wait = limiter.observe(error.response.headers, limited=error.status_code == 429)
+        elif isinstance(error, self.openai.APIConnectionError):
+            wait = 0.0
+        else:
+            return None
+        # Full jitter keeps concurrent retries from arriving in lockstep.
+        return max(wait, random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+
+    async def call(self, provider, model, messages, stream=False):
+        # For streams the limiter slot stays taken until the caller releases it.
+        client, limiter = self.client(provider)
+        attempt = 0
+        while True:
+            await limiter.acquire()
+            self.count("requests")
+            try:
+                raw = await client.chat.completions.with_raw_response.create(
+                    model=model, messages=messages, stream=stream)
+            except BaseException as e:
+                limiter.release()
+                delay = self.retry_delay(e, attempt, limiter)
+                if delay is None:
+                    raise
+                attempt += 1
+                self.count("retries")
+                await asyncio.sleep(delay)
+                continue
+            limiter.observe(raw.headers)
+            if not stream:
+                limiter.release()
+            return raw.parse(), limiter
+
+    async def request(self, provider, model, messages):
+        completion, _ = await self.call(provider, model, messages)
+        if completion.usage is not None:
+            self.count("prompt_tokens", completion.usage.prompt_tokens or 0)
+            self.count("completion_tokens", completion.usage.completion_tokens or 0)
+        return completion.choices[0].message.content
+
+    async def hedged(self, provider, model, messages):
+        primary = asyncio.ensure_future(self.request(provider, model, messages))
+        if self.hedge is None or self.hedge[0] == provider:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done and primary.exception() is None:
+            return primary.result()
+        if done:
+            self.count("failovers")
+            return await self.request(*self.hedge, messages)
+
+        self.count("hedged")
+        backup = asyncio.ensure_future(self.request(*self.hedge, messages))
+        pending, error = {primary, backup}, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _stream(self, provider, model, messages):
+        response, limiter = await self.call(provider, model, messages, stream=True)
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            limiter.release()
+            await response.close()
+
+    def run(self, coro):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def complete(self, provider, model, messages):
+        return self.run(self.hedged(provider, model, messages))
+
+    def stream(self, provider, model, messages):
+        chunks = self._stream(provider, model, messages)
+        try:
+            while True:
+                try:
+                    yield self.run(chunks.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run(chunks.aclose())
+
+    def close(self):
+        for client in list(self.clients.values()):
+            asyncio.run_coroutine_threadsafe(client.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def shared_pool():
+    # BISECTOR_HEDGE="openrouter:microsoft/mai-ds-r1:free" with BISECTOR_HEDGE_AFTER=<seconds>
+    # enables hedging; BISECTOR_MAX_CONCURRENCY caps in-flight requests per provider.
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            hedge = os.getenv("BISECTOR_HEDGE")
+            hedge_after = os.getenv("BISECTOR_HEDGE_AFTER")
+            _SHARED = ClientPool(
+                max_concurrency=int(os.getenv("BISECTOR_MAX_CONCURRENCY", MAX_CONCURRENCY)),
+                hedge=tuple(hedge.split(":", 1)) if hedge else None,
+                hedge_after=float(hedge_after) if hedge_after else None,
+            )
+        return _SHARED
@@ -0,0 +1,75 @@
+import difflib
+from collections import Counter
+
+
+DEFAULT_CONTEXT = 3
+
+
+def normalize(line):
+    return "".join(line.split())
+
+
+# Step-to-step diff as described in paper.md: "+" added, "-" removed and "~"
+# relocated, i.e. a line whose text survives (up to whitespace) but moves or
+# is re-indented. A relocated line is shown once, at its new position.
+def annotate(old_lines, new_lines):
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    opcodes = matcher.get_opcodes()
+
+    removed, added = Counter(), Counter()
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag != "equal":
+            removed.update(normalize(line) for line in old_lines[i1:i2])
+            added.update(normalize(line) for line in new_lines[j1:j2])
+    moved_out = removed & added
+    moved_in = Counter(moved_out)
+
+    rows = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            rows.extend((" ", i1 + k + 1, j1 + k + 1, old_lines[i1 + k]) for k in range(i2 - i1))
+            continue
+        for i in range(i1, i2):
+            key = normalize(old_lines[i])
+            if moved_out[key]:
+                moved_out[key] -= 1
+            else:
+                rows.append(("-", i + 1, None, old_lines[i]))
+        for j in range(j1, j2):
+            key = normalize(new_lines[j])
+            if moved_in[key]:
+                moved_in[key] -= 1
+                rows.append(("~", None, j + 1, new_lines[j]))
+            else:
+                rows.append(("+", None, j + 1, new_lines[j]))
+    return rows
+
+
+def hunks(rows, context=DEFAULT_CONTEXT):
+    changed = [k for k, row in enumerate(rows) if row[0] != " "]
+    groups = []
+    for k in changed:
+        start, end = max(k - context, 0), min(k + context + 1, len(rows))
+        if groups and start <= groups[-1][1]:
+            groups[-1][1] = end
+        else:
+            groups.append([start, end])
+    return [rows[start:end] for start, end in groups]
+
+
+def format_hunk(hunk):
+    old_nos = [row[1] for row in hunk if row[1] is not None]
+    new_nos = [row[2] for row in hunk if row[2] is not None]
+    old_len = sum(1 for row in hunk if row[0] in " -")
+    new_len = sum(1 for row in hunk if row[0] in " +~")
+    header = f"@@ -{old_nos[0] if old_nos else 0},{old_len} +{new_nos[0] if new_nos else 0},{new_len} @@"
+    return "\n".join([header] + [f"{tag}{text}" for tag, _, _, text in hunk])
+
+
+def annotated_diff(old_text, new_text, context=DEFAULT_CONTEXT, fromfile="previous", tofile="current"):
+    old_lines = (old_text or "").splitlines()
+    new_lines = (new_text or "").splitlines()
+    parts = [format_hunk(hunk) for hunk in hunks(annotate(old_lines, new_lines), context)]
+    if not parts:
+        return ""
+    return "\n".join([f"--- {fromfile}", f"+++ {tofile}"] + parts)
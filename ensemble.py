@@ -0,0 +1,141 @@
+import os
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from summarizer import DiffSummarizer, get_summarizer_class
+from verdict import parse_verdict, VerdictError
+
+
+DEFAULT_MEMBERS = "gpt,openrouter"
+DEFAULT_SAMPLES = 3
+DEFAULT_QUORUM = 0.5
+MIN_WEIGHT = 0.05
+
+
+# Running tally of the ensemble's samples; add() says when the vote is decided.
+class Votes:
+    def __init__(self, total, quorum):
+        self.total = total
+        self.quorum = quorum
+        self.weights = {"good": 0.0, "bad": 0.0}
+        self.verdicts = {"good": [], "bad": []}
+        self.answered = 0
+
+    def add(self, answer):
+        self.answered += 1
+        try:
+            if isinstance(answer, BaseException):
+                raise answer
+            verdict = parse_verdict(answer)
+        except Exception as e:
+            print(f"[Ensemble sample dropped: {e}]")
+            return False
+        weight = max(verdict.behaviour_confidence / 100.0, MIN_WEIGHT)
+        if verdict.has_compile_error:
+            weight *= 0.5
+        self.weights[verdict.bisect_mark] += weight
+        self.verdicts[verdict.bisect_mark].append(verdict)
+
+        lead = max(self.weights, key=self.weights.get)
+        other = "good" if lead == "bad" else "bad"
+        remaining = self.total - self.answered
+        return self.weights[lead] > self.quorum * self.total or self.weights[lead] > self.weights[other] + remaining
+
+
+# Self-consistency voting: `samples` independent answers from each member
+# model, weighted by their behaviour_confidence. Stops as soon as one mark
+# holds more than `quorum` of the total possible weight, or can no longer be
+# overtaken, and cancels the outstanding requests. API members run as tasks
+# on the client pool so cancelling closes their HTTP requests; an ensemble
+# with a local member falls back to threads.
+class EnsembleSummarizer(DiffSummarizer):
+    label = "Ensemble"
+    incremental = False
+
+    def __init__(self, problem, cache=None, streaming=False, pool=None, members=None, samples=None,
+                 quorum=DEFAULT_QUORUM):
+        names = members or os.getenv("BISECTOR_ENSEMBLE", DEFAULT_MEMBERS)
+        if isinstance(names, str):
+            names = [n.strip() for n in names.split(",") if n.strip()]
+        classes = [get_summarizer_class(name) for name in names]
+        if pool is None and all(cls.provider for cls in classes):
+            from client_pool import shared_pool
+            pool = shared_pool()
+        super().__init__(cache, streaming, pool)
+        self.problem = problem
+        self.members = [cls(problem, pool=pool) for cls in classes]
+        self.samples = samples or int(os.getenv("BISECTOR_ENSEMBLE_SAMPLES", DEFAULT_SAMPLES))
+        self.quorum = quorum
+        self.model = f"ensemble({','.join(m.model for m in self.members)})x{self.samples}"
+        self.last_votes = None
+
+    def draws(self, member):
+        # A member that decodes greedily gives the same answer every time;
+        # asking it again would only multiply its weight.
+        return 1 if member.deterministic else self.samples
+
+    def complete(self, diff_text):
+        votes = Votes(sum(self.draws(member) for member in self.members), self.quorum)
+        if self.pool is not None and all(member.provider for member in self.members):
+            parts = [member.parts(diff_text) for member in self.members]
+            self.pool.run(self.vote(parts, votes))
+        else:
+            self.vote_threads(diff_text, votes)
+
+        if not votes.verdicts["good"] and not votes.verdicts["bad"]:
+            raise VerdictError("No ensemble sample returned a usable verdict")
+        return self.aggregate(votes.weights, votes.verdicts, votes.answered, votes.total)
+
+    async def vote(self, parts, votes):
+        tasks = [asyncio.ensure_future(member.acomplete(member_parts))
+                 for member, member_parts in zip(self.members, parts) for _ in range(self.draws(member))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    answer = await next_done
+                except Exception as e:
+                    answer = e
+                if votes.add(answer):
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def vote_threads(self, diff_text, votes):
+        # Blocking clients cannot be interrupted, so at most one sample per
+        # member is in flight and the queued ones are cancelled on quorum.
+        executor = ThreadPoolExecutor(max_workers=len(self.members), thread_name_prefix="ensemble")
+        futures = [executor.submit(member.complete, diff_text)
+                   for k in range(self.samples) for member in self.members if k < self.draws(member)]
+        try:
+            for future in as_completed(futures):
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    answer = e
+                if votes.add(answer):
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def aggregate(self, weights, verdicts, answered, total):
+        mark = max(weights, key=weights.get)
+        best = max(verdicts[mark], key=lambda v: v.behaviour_confidence)
+        result = best.to_dict()
+        result["bisect_mark"] = mark
+        # Samples that came back without a usable verdict count against it.
+        usable = len(verdicts["good"]) + len(verdicts["bad"])
+        share = weights[mark] / (weights["good"] + weights["bad"])
+        result["behaviour_confidence"] = round(100 * share * usable / answered)
+        result["has_compile_error"] = sum(v.has_compile_error for v in verdicts[mark]) * 2 > len(verdicts[mark])
+        result["votes"] = {
+            "good": len(verdicts["good"]),
+            "bad": len(verdicts["bad"]),
+            "weights": {k: round(v, 3) for k, v in weights.items()},
+            "answered": answered,
+            "dropped": answered - usable,
+            "requested": total,
+        }
+        self.last_votes = result["votes"]
+        return json.dumps(result, indent=2)
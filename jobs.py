@@ -0,0 +1,111 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAX_WORKERS = 4
+SESSION_TTL = 24 * 3600
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = "queued"
+        self.messages = []
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def progress(self, message):
+        self.messages.append(message)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "messages": list(self.messages),
+            "error": self.error,
+            "elapsed": round((self.finished or time.time()) - (self.started or self.submitted), 2),
+        }
+
+
+# Bounded pool for slow per-session work (mirror clone or fetch, worktree
+# setup) so request handlers only enqueue it and the page polls for progress.
+class JobRunner:
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, job_id, fn, *args):
+        job = Job(job_id)
+        with self.lock:
+            self.jobs[job_id] = job
+        self.executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = fn(job, *args)
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def position(self, job_id):
+        with self.lock:
+            queued = [job for job in self.jobs.values() if job.status == "queued"]
+        queued.sort(key=lambda job: job.submitted)
+        return next((k + 1 for k, job in enumerate(queued) if job.id == job_id), 0)
+
+    def forget(self, job_id):
+        with self.lock:
+            self.jobs.pop(job_id, None)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Bisect state lives on the server, keyed by an opaque id that is all the
+# Flask cookie carries. Each entry has its own lock so steps of one session
+# run one at a time while other sessions proceed.
+class SessionStore:
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def create(self, sid=None, **state):
+        sid = sid or uuid.uuid4().hex
+        state.update(id=sid, created=time.time(), touched=time.time(), lock=threading.RLock())
+        with self.lock:
+            self.sessions[sid] = state
+        return sid
+
+    def get(self, sid):
+        with self.lock:
+            state = self.sessions.get(sid) if sid else None
+        if state is not None:
+            state["touched"] = time.time()
+        return state
+
+    def drop(self, sid):
+        with self.lock:
+            return self.sessions.pop(sid, None)
+
+    def expire(self):
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            expired = [sid for sid, state in self.sessions.items() if state["touched"] < cutoff]
+            return [self.sessions.pop(sid) for sid in expired]
@@ -0,0 +1,68 @@
+import os
+import json
+import time
+
+
+# Append-only record of a bisect session: a "session" line with everything
+# needed to reopen it, then one "step" line per mark (commit, mark, who made
+# it, the verdict and timings). Every line is fsync'd before the mark takes
+# effect, so a crash loses at most the step in flight. A journal can hold
+# several sessions; only the last one is resumed.
+class Journal:
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, record):
+        record.setdefault("time", time.time())
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def start(self, **meta):
+        self.write(dict(meta, type="session"))
+
+    def append(self, commit, mark, by, verdict=None, **extra):
+        entry = {"type": "step", "commit": commit, "mark": mark, "by": by}
+        if verdict is not None:
+            entry["verdict"] = verdict.to_dict()
+        entry.update(extra)
+        self.write(entry)
+
+    def records(self):
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write.
+                    continue
+        return records
+
+    def session(self):
+        meta, steps = None, []
+        for record in self.records():
+            if record.get("type") == "session":
+                meta, steps = record, []
+            elif "commit" in record:
+                steps.append(record)
+        return meta, steps
+
+    def meta(self):
+        return self.session()[0]
+
+    def entries(self):
+        return self.session()[1]
+
+    def replay(self, engine):
+        count = 0
+        for entry in self.entries():
+            if entry["commit"] in engine.graph.index:
+                engine.mark(entry["commit"], entry["mark"])
+                count += 1
+        return count
@@ -0,0 +1,164 @@
+import os
+import copy
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+from summarizer import DiffSummarizer, GPTDiffSummarizer
+
+
+DEFAULT_MODEL = "deepseek-ai/deepseek-coder-1.3b-instruct"
+DIFF_PLACEHOLDER = "\0DIFF\0"
+MAX_NEW_TOKENS = 1024
+MAX_BATCH = 4
+BATCH_WINDOW = 0.02
+MAX_PREFIXES = 8
+
+_RESIDENT = {}
+_RESIDENT_LOCK = threading.Lock()
+
+
+# One loaded model per (model id, device) for the whole process. A single
+# worker thread owns it: requests that arrive within BATCH_WINDOW of each
+# other are decoded together, and the KV state of the shared prompt prefix
+# (system prompt + rubric) is computed once and reused by every call.
+class ResidentModel:
+    def __init__(self, model_id, device):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+        self.torch = torch
+        self.device = device
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        if self.tokenizer.pad_token_id is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        dtype = torch.float32 if device == "cpu" else torch.bfloat16
+        self.model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=dtype, low_cpu_mem_usage=True).to(device)
+        self.model.eval()
+        self.prefixes = {}
+        self.requests = queue.Queue()
+        threading.Thread(target=self._serve, name="local-model", daemon=True).start()
+
+    def split_prompt(self, messages):
+        text = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        prefix, _, rest = text.partition(DIFF_PLACEHOLDER)
+        return prefix, rest
+
+    def submit(self, prefix, suffix, max_new_tokens):
+        future = Future()
+        self.requests.put((prefix, suffix, max_new_tokens, future))
+        return future
+
+    def _serve(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + BATCH_WINDOW
+            while len(batch) < MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for request in batch:
+                groups.setdefault(request[0], []).append(request)
+            for prefix, requests in groups.items():
+                try:
+                    texts = self.generate(prefix, [r[1] for r in requests], max(r[2] for r in requests))
+                    for request, text in zip(requests, texts):
+                        request[3].set_result(text)
+                except Exception as e:
+                    for request in requests:
+                        request[3].set_exception(e)
+
+    def prefix_cache(self, prefix):
+        if prefix not in self.prefixes:
+            ids = self.tokenizer(prefix, return_tensors="pt", add_special_tokens=False).input_ids.to(self.device)
+            with self.torch.no_grad():
+                past = self.model(ids, use_cache=True).past_key_values
+            if isinstance(past, tuple):
+                from transformers import DynamicCache
+                past = DynamicCache.from_legacy_cache(past)
+            if len(self.prefixes) >= MAX_PREFIXES:
+                self.prefixes.pop(next(iter(self.prefixes)))
+            self.prefixes[prefix] = (ids, past)
+        return self.prefixes[prefix]
+
+    def generate(self, prefix, suffixes, max_new_tokens):
+        torch = self.torch
+        prefix_ids, prefix_past = self.prefix_cache(prefix)
+        pad = self.tokenizer.pad_token_id
+        encoded = [self.tokenizer(s, add_special_tokens=False).input_ids for s in suffixes]
+        width = max(len(ids) for ids in encoded)
+        n = len(suffixes)
+
+        # Pad between the cached prefix and each suffix; the attention mask hides
+        # the padding and position ids follow the mask, so every row sees the
+        # same prefix state.
+        suffix_ids = torch.tensor([[pad] * (width - len(ids)) + ids for ids in encoded], device=self.device)
+        suffix_mask = torch.tensor([[0] * (width - len(ids)) + [1] * len(ids) for ids in encoded], device=self.device)
+        input_ids = torch.cat([prefix_ids.expand(n, -1), suffix_ids], dim=1)
+        attention_mask = torch.cat([torch.ones_like(prefix_ids).expand(n, -1), suffix_mask], dim=1)
+
+        past = copy.deepcopy(prefix_past)
+        if n > 1:
+            if hasattr(past, "batch_repeat_interleave"):
+                past.batch_repeat_interleave(n)
+            else:
+                past = None
+        with torch.no_grad():
+            output = self.model.generate(input_ids=input_ids, attention_mask=attention_mask, past_key_values=past,
+                                         max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=pad)
+        return self.tokenizer.batch_decode(output[:, input_ids.shape[1]:], skip_special_tokens=True)
+
+
+def resident_model(model_id, device):
+    with _RESIDENT_LOCK:
+        key = (model_id, device)
+        if key not in _RESIDENT:
+            print(f"Loading local model {model_id} on {device}...")
+            _RESIDENT[key] = ResidentModel(model_id, device)
+        return _RESIDENT[key]
+
+
+class LocalHFSummarizer(DiffSummarizer):
+    label = "Local"
+    incremental = False
+    deterministic = True
+    messages = GPTDiffSummarizer.messages
+    prompt_version = GPTDiffSummarizer.prompt_version
+
+    def __init__(self, problem, cache=None, streaming=False, pool=None, model_id=None, device=None,
+                 max_new_tokens=MAX_NEW_TOKENS):
+        super().__init__(cache, streaming, pool)
+        self.problem = problem
+        self.model = model_id or os.getenv("BISECTOR_LOCAL_MODEL", DEFAULT_MODEL)
+        self.device = device or os.getenv("BISECTOR_LOCAL_DEVICE", "cpu")
+        self.max_new_tokens = max_new_tokens
+        self.resident = resident_model(self.model, self.device)
+
+    def submit(self, diff_text):
+        prefix, rest = self.resident.split_prompt(self.messages(DIFF_PLACEHOLDER))
+        return self.resident.submit(prefix, diff_text + rest, self.max_new_tokens)
+
+    def request(self, diff_text):
+        return self.submit(diff_text).result()
+
+    # Cache misses that fit one prompt go to the resident model together, so
+    # its worker can decode them as one batch.
+    def analyse_batch(self, diffs):
+        results = [self.cached(diff) for diff in diffs]
+        parts = [self.parts(diff) if results[i] is None else None for i, diff in enumerate(diffs)]
+        futures = {i: self.submit(diff) for i, diff in enumerate(diffs) if parts[i] is not None and len(parts[i]) == 1}
+        for i, diff in enumerate(diffs):
+            if i in futures:
+                results[i] = futures[i].result()
+            elif parts[i] is not None:
+                results[i] = self.complete(diff)
+            else:
+                continue
+            self.store(diff, results[i])
+        return results
@@ -0,0 +1,98 @@
+import os
+import re
+import time
+import shlex
+import sqlite3
+import hashlib
+import threading
+
+
+DEFAULT_MEMORY_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bisector", "marks.sqlite")
+
+
+def problem_signature(problem, target_path=None):
+    h = hashlib.sha256()
+    for part in (" ".join((problem or "").split()).lower(), target_path or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def predicate_signature(command, cwd=None):
+    # The command line plus the contents of every file it names, so editing
+    # the test script is a new predicate even when the command is unchanged.
+    h = hashlib.sha256(command.encode("utf-8"))
+    try:
+        words = shlex.split(command)
+    except ValueError:
+        words = command.split()
+    for word in words:
+        path = os.path.join(cwd or os.getcwd(), word)
+        if re.match(r"^[\w./\\-]+$", word) and os.path.isfile(path):
+            h.update(b"\0" + word.encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+# Good and bad marks from earlier sessions, per repository, per question
+# asked of it ("llm" sessions sign the problem text, "predicate" runs the
+# command and its script) and per signature, so going back to an earlier
+# problem finds its marks again.
+class MarkMemory:
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("BISECTOR_MARK_MEMORY", DEFAULT_MEMORY_PATH)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(marks)")]
+        if columns and "signature" not in columns:
+            # Stores from before marks were kept per signature.
+            self.db.execute("ALTER TABLE marks RENAME TO unsigned_marks")
+        self.db.execute("CREATE TABLE IF NOT EXISTS marks ("
+                        "repo TEXT, scope TEXT, signature TEXT, commit_sha TEXT, mark TEXT, by TEXT, created REAL, "
+                        "PRIMARY KEY (repo, scope, signature, commit_sha))")
+        if columns and "signature" not in columns:
+            self.db.execute("INSERT OR IGNORE INTO marks SELECT m.repo, m.scope, s.signature, m.commit_sha, m.mark, "
+                            "m.by, m.created FROM unsigned_marks m JOIN scopes s USING (repo, scope)")
+            self.db.execute("DROP TABLE unsigned_marks")
+            self.db.execute("DROP TABLE IF EXISTS scopes")
+        self.db.commit()
+
+    def open(self, repo, scope, signature):
+        return MemoryScope(self, repo, scope, signature)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class MemoryScope:
+    def __init__(self, memory, repo, scope, signature):
+        self.memory = memory
+        self.repo = repo
+        self.scope = scope
+        self.signature = signature
+
+    def recall(self):
+        with self.memory.lock:
+            rows = self.memory.db.execute("SELECT commit_sha, mark FROM marks WHERE repo = ? AND scope = ? "
+                                          "AND signature = ?", (self.repo, self.scope, self.signature)).fetchall()
+        return dict(rows)
+
+    def remember(self, commit, mark, by):
+        if mark not in ("good", "bad"):
+            return
+        with self.memory.lock:
+            self.memory.db.execute("INSERT OR REPLACE INTO marks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   (self.repo, self.scope, self.signature, commit, mark, by, time.time()))
+            self.memory.db.commit()
+
+
+def open_scope(option, repo, scope, signature):
+    # Off unless asked for: memory=1 uses the default store, memory=<path>
+    # another one.
+    if option in (None, "", "0", "false", "no"):
+        return None
+    path = None if option in ("1", "true", "yes") else option
+    return MarkMemory(path).open(repo, scope, signature)
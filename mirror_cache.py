@@ -0,0 +1,157 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+
+
+DEFAULT_CACHE_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "bisector", "mirrors")
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+DEFAULT_MAX_AGE_DAYS = 30
+STAMP_NAME = "bisector-last-used"
+FETCH_BATCH = 10000
+
+_LOCKS = {}
+_LOCKS_LOCK = threading.Lock()
+
+
+def mirror_lock(path):
+    # Sessions in one process that share a mirror take turns fetching into it
+    # and adding or removing worktrees.
+    with _LOCKS_LOCK:
+        return _LOCKS.setdefault(os.path.abspath(path), threading.RLock())
+
+
+# One bare partial-clone mirror per remote URL, cloned once and then only fetched.
+# Sessions get a sparse worktree on top of it instead of a fresh clone.
+class MirrorCache:
+    def __init__(self, cache_root=None, max_bytes=DEFAULT_MAX_BYTES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.cache_root = cache_root or os.environ.get("BISECTOR_CACHE", DEFAULT_CACHE_ROOT)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+    def mirror_path(self, repo_url):
+        url = repo_url.strip().rstrip("/")
+        if url.endswith(".git"):
+            url = url[:-4]
+        name = os.path.basename(url) or "repo"
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_root, f"{name}-{digest}.git")
+
+    def ensure_mirror(self, repo_url):
+        path = self.mirror_path(repo_url)
+        if os.path.isdir(os.path.join(path, "objects")):
+            print(f"Updating mirror: {path}")
+            subprocess.run(["git", "fetch", "--prune", "--no-tags", "origin"], cwd=path, check=True)
+        else:
+            os.makedirs(self.cache_root, exist_ok=True)
+            print(f"git clone --mirror --filter=blob:none {repo_url} {path}")
+            subprocess.run(["git", "clone", "--mirror", "--filter=blob:none", repo_url, path], check=True)
+        self.touch(path)
+        self.evict(keep=path)
+        return path
+
+    def add_worktree(self, repo_url, work_path, target_paths):
+        if isinstance(target_paths, str):
+            target_paths = [target_paths]
+        with mirror_lock(self.mirror_path(repo_url)):
+            mirror = self.ensure_mirror(repo_url)
+            subprocess.run(["git", "worktree", "prune"], cwd=mirror, check=True)
+            subprocess.run(["git", "worktree", "add", "--no-checkout", "--detach", work_path, "HEAD"], cwd=mirror,
+                           check=True)
+        subprocess.run(["git", "sparse-checkout", "init", "--cone"], cwd=work_path, check=True)
+        subprocess.run(["git", "sparse-checkout", "set"] + list(target_paths), cwd=work_path, check=True)
+        subprocess.run(["git", "checkout", "--detach", "HEAD"], cwd=work_path, check=True)
+        return mirror
+
+    def missing_blobs(self, mirror, revs, paths=None):
+        cmd = ["git", "rev-list", "--objects", "--missing=print"] + list(revs)
+        if paths:
+            cmd += ["--"] + list(paths)
+        out = subprocess.run(cmd, cwd=mirror, stdout=subprocess.PIPE, text=True, check=True).stdout
+        return [line[1:] for line in out.splitlines() if line.startswith("?")]
+
+    def blobs(self, mirror, revs, paths=None):
+        cmd = ["git", "rev-list", "--objects", "--filter=object:type=blob", "--missing=allow-promisor"] + list(revs)
+        if paths:
+            cmd += ["--"] + list(paths)
+        out = subprocess.run(cmd, cwd=mirror, stdout=subprocess.PIPE, text=True, check=True).stdout
+        return [line.split(" ", 1)[0] for line in out.splitlines() if " " in line]
+
+    def prefetch_blobs(self, mirror, revs, paths=None):
+        # A blob:none mirror would otherwise fetch each target blob lazily, one
+        # round trip per checkout or read. Ask for all of them in one go, the
+        # same way git's own lazy fetch does.
+        missing = self.missing_blobs(mirror, revs, paths)
+        if not missing:
+            return 0
+        print(f"Prefetching {len(missing)} blobs into {mirror}")
+        with mirror_lock(mirror):
+            for start in range(0, len(missing), FETCH_BATCH):
+                subprocess.run(["git", "-c", "fetch.negotiationAlgorithm=noop", "fetch", "origin", "--no-tags",
+                                "--no-write-fetch-head", "--recurse-submodules=no", "--filter=blob:none", "--stdin"],
+                               cwd=mirror, input="\n".join(missing[start:start + FETCH_BATCH]) + "\n", text=True,
+                               check=True)
+        return len(missing)
+
+    def remove_worktree(self, mirror, work_path):
+        if mirror and os.path.isdir(mirror):
+            with mirror_lock(mirror):
+                subprocess.run(["git", "worktree", "remove", "--force", work_path], cwd=mirror,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                subprocess.run(["git", "worktree", "prune"], cwd=mirror)
+
+    def touch(self, path):
+        with open(os.path.join(path, STAMP_NAME), "w") as f:
+            f.write(str(time.time()))
+
+    def last_used(self, path):
+        try:
+            return os.path.getmtime(os.path.join(path, STAMP_NAME))
+        except OSError:
+            return os.path.getmtime(path)
+
+    def size_of(self, path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def in_use(self, path):
+        worktrees = os.path.join(path, "worktrees")
+        return os.path.isdir(worktrees) and bool(os.listdir(worktrees))
+
+    def mirrors(self):
+        if not os.path.isdir(self.cache_root):
+            return []
+        return [os.path.join(self.cache_root, d) for d in os.listdir(self.cache_root) if d.endswith(".git")]
+
+    def evict(self, keep=None):
+        now = time.time()
+        entries = []
+        for path in self.mirrors():
+            if keep and os.path.samefile(path, keep):
+                continue
+            if self.in_use(path):
+                continue
+            age_days = (now - self.last_used(path)) / 86400
+            if self.max_age_days is not None and age_days > self.max_age_days:
+                print(f"Evicting stale mirror: {path}")
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            entries.append((self.last_used(path), path, self.size_of(path)))
+
+        if self.max_bytes is None:
+            return
+        total = sum(size for _, _, size in entries) + (self.size_of(keep) if keep else 0)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            print(f"Evicting mirror to stay under cache limit: {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
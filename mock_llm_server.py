@@ -0,0 +1,223 @@
+import sys
+import json
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+DEFAULT_MARKER = "BUG"
+
+
+def diff_of(messages):
+    text = messages[-1]["content"] if messages else ""
+    start = text.find("--- BEGIN DIFF ---")
+    end = text.rfind("--- END DIFF ---")
+    return text[start + len("--- BEGIN DIFF ---"):end] if start != -1 and end != -1 else text
+
+
+# A deterministic stand-in for the rubric prompt: the current version is bad
+# when the marker is present on an added, moved or context line and good when
+# the diff only removes it. Without the marker in sight it guesses "good" with
+# low confidence, like a model that found nothing relevant.
+def rubric_responder(marker=DEFAULT_MARKER):
+    def respond(messages, model):
+        present, removed = False, False
+        for line in diff_of(messages).splitlines():
+            if marker not in line or line.startswith(("---", "+++", "@@")):
+                continue
+            if line.startswith("-"):
+                removed = True
+            else:
+                present = True
+        if present:
+            mark, change, confidence = "bad", "introduces", 90
+        elif removed:
+            mark, change, confidence = "good", "removes", 85
+        else:
+            mark, change, confidence = "good", "no-effect", 40
+        return json.dumps({
+            "has_compile_error": False,
+            "behaviour_change": change,
+            "behaviour_confidence": confidence,
+            "sem_edits": [],
+            "counterfactual_fix": "",
+            "reasoning_chain": [f"marker {marker!r} {'present' if present else 'removed' if removed else 'absent'}"],
+            "reflection": f"mock answer from {model}",
+            "bisect_mark": mark,
+        })
+    return respond
+
+
+def count_tokens(text):
+    return max(1, len(text) // 4)
+
+
+# OpenAI-compatible /v1/chat/completions on localhost for tests and the
+# evaluation harness. Every behaviour is deterministic: `fail_every` turns
+# every n-th request into a 503, `rate_limit` caps requests per second and
+# answers 429 with the same x-ratelimit-* headers the real APIs send.
+class MockLLMServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_every=0, rate_limit=0, responder=None,
+                 chunk_size=16):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.rate_limit = rate_limit
+        self.responder = responder or rubric_responder()
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-llm", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def admit(self):
+        with self.lock:
+            self.requests += 1
+            number = self.requests
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            remaining = max(self.rate_limit - self.window_count, 0) if self.rate_limit else None
+            limited = self.rate_limit and self.window_count > self.rate_limit
+            reset = max(1.0 - (now - self.window_start), 0.0)
+        if self.fail_every and number % self.fail_every == 0:
+            return 503, {}
+        headers = {}
+        if self.rate_limit:
+            headers = {
+                "x-ratelimit-limit-requests": str(self.rate_limit),
+                "x-ratelimit-remaining-requests": str(remaining),
+                "x-ratelimit-reset-requests": f"{reset:.3f}s",
+            }
+            if limited:
+                headers["retry-after"] = f"{reset:.3f}"
+                return 429, headers
+        return 200, headers
+
+    def complete(self, body):
+        messages = body.get("messages", [])
+        model = body.get("model", "mock")
+        content = self.responder(messages, model)
+        prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = count_tokens(content)
+        with self.lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        ident = "chatcmpl-" + hashlib.sha1(content.encode("utf-8")).hexdigest()[:24]
+        return ident, model, content, usage
+
+    def stats(self):
+        with self.lock:
+            return {"requests": self.requests, "prompt_tokens": self.prompt_tokens,
+                    "completion_tokens": self.completion_tokens}
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionError:
+                    pass  # a hedged or cancelled request hung up
+
+            def send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+                    return
+
+                status, headers = server.admit()
+                if status != 200:
+                    self.send_json(status, {"error": {"message": "mock failure", "type": "server_error", "code": status}},
+                                   headers)
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+
+                ident, model, content, usage = server.complete(body)
+                created = int(time.time())
+                if not body.get("stream"):
+                    self.send_json(200, {
+                        "id": ident, "object": "chat.completion", "created": created, "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                        "usage": usage,
+                    }, headers)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.close_connection = True
+                step = server.chunk_size
+                for i in range(0, len(content), step):
+                    chunk = {"id": ident, "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                done = {"id": ident, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    args = dict(arg.split('=', 1) for arg in sys.argv[1:] if '=' in arg)
+    mock = MockLLMServer(host=args.get('host', '127.0.0.1'), port=int(args.get('port', 8008)),
+                         latency=float(args.get('latency', 0)), fail_every=int(args.get('fail_every', 0)),
+                         rate_limit=int(args.get('rate_limit', 0)),
+                         responder=rubric_responder(args.get('marker', DEFAULT_MARKER)))
+    print(f"Mock LLM server on {mock.url} (set OPENAI_BASE_URL to use it)")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
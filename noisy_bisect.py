@@ -0,0 +1,146 @@
+import sys
+import math
+
+from auto_bisect import WorktreePool, PredicateRunner, first_parent_commits, parse_cli_args
+from relevance import problem_prior
+
+
+MAX_RUNS = 200
+# Bits of expected information below which another run is not worth making.
+MIN_GAIN = 1e-3
+
+
+def entropy(p):
+    if p <= 0.0 or p >= 1.0:
+        return 0.0
+    return -p * math.log2(p) - (1 - p) * math.log2(1 - p)
+
+
+# Probabilistic bisection for a flaky predicate (the noisy oracle P in paper.md).
+# Keeps a posterior over which commit is the first bad one, tests where the
+# expected information gain is largest and stops at the target confidence.
+#   false_negative: P(predicate says good | commit is bad)
+#   false_positive: P(predicate says bad | commit is good)
+class NoisyBisector:
+    def __init__(self, repo_path, command, good, bad, confidence=0.95, false_negative=0.1,
+                 false_positive=0.01, max_runs=MAX_RUNS, timeout=None, prior=None):
+        self.repo_path = repo_path
+        self.good = good if isinstance(good, list) else [good]
+        self.bad = bad
+        self.confidence = confidence
+        self.false_negative = false_negative
+        self.false_positive = false_positive
+        self.max_runs = max_runs
+        self.runner = PredicateRunner(command, timeout)
+        self.prior = prior
+        self.posterior = []
+        self.untestable = set()
+        self.history = []
+
+    def start(self, commits):
+        weights = [self.prior.get(sha, 0.0) for sha in commits] if self.prior else [1.0] * len(commits)
+        total = sum(weights)
+        self.posterior = [w / total for w in weights] if total > 0 else [1.0 / len(commits)] * len(commits)
+
+    def information_gain(self, t, bad_mass):
+        p_bad = bad_mass * (1 - self.false_negative) + (1 - bad_mass) * self.false_positive
+        noise = bad_mass * entropy(self.false_negative) + (1 - bad_mass) * entropy(self.false_positive)
+        return entropy(p_bad) - noise
+
+    def next_point(self):
+        # The last candidate is the known-bad endpoint and is never tested.
+        best, best_gain, bad_mass = None, -1.0, 0.0
+        for t in range(len(self.posterior) - 1):
+            bad_mass += self.posterior[t]
+            if t in self.untestable:
+                continue
+            gain = self.information_gain(t, bad_mass)
+            if gain > best_gain:
+                best, best_gain = t, gain
+        return best, best_gain
+
+    def group(self, k):
+        # Testing t only separates commits up to t from those after it, so a
+        # run of untestable commits and the commit right after it cannot be
+        # told apart.
+        lo, hi = k, k
+        while lo > 0 and lo - 1 in self.untestable:
+            lo -= 1
+        while hi in self.untestable and hi < len(self.posterior) - 1:
+            hi += 1
+        return list(range(lo, hi + 1))
+
+    def update(self, t, mark):
+        if mark == "bad":
+            at_or_before, after = 1 - self.false_negative, self.false_positive
+        else:
+            at_or_before, after = self.false_negative, 1 - self.false_positive
+        posterior = [p * (at_or_before if k <= t else after) for k, p in enumerate(self.posterior)]
+        total = sum(posterior)
+        self.posterior = [p / total for p in posterior]
+
+    def best(self):
+        k = max(range(len(self.posterior)), key=self.posterior.__getitem__)
+        return k, self.posterior[k]
+
+    def run(self):
+        commits = first_parent_commits(self.repo_path, self.good, self.bad)
+        if not commits:
+            print("Nothing to bisect: bad commit is reachable from good.")
+            return None
+        self.start(commits)
+        print(f"Noisy bisect over {len(commits)} first-parent commits, target confidence {self.confidence:.0%}...")
+
+        pool = WorktreePool(self.repo_path, 1)
+        try:
+            while True:
+                k, p = self.best()
+                if p >= self.confidence or len(commits) == 1:
+                    break
+                if sum(self.posterior[g] for g in self.group(k)) >= self.confidence:
+                    break
+                if self.max_runs is not None and self.runner.runs >= self.max_runs:
+                    print(f"Stopped after {self.runner.runs} runs below target confidence.")
+                    break
+                t, gain = self.next_point()
+                if t is None:
+                    print("Only untestable commits are left to test.")
+                    break
+                if gain < MIN_GAIN:
+                    print("Stopped: no testable commit is left that would change the posterior.")
+                    break
+                mark, _ = self.runner.run(pool, commits[t])
+                if mark == "skip":
+                    self.untestable.add(t)
+                else:
+                    self.update(t, mark)
+                self.history.append((commits[t], mark))
+                print(f"Run {self.runner.runs}: {commits[t][:10]}={mark}, "
+                      f"best {commits[self.best()[0]][:10]} at {self.best()[1]:.1%}")
+        finally:
+            pool.close()
+
+        k, p = self.best()
+        group = self.group(k)
+        if len(group) > 1 and sum(self.posterior[g] for g in group) > p:
+            print(f"There are only 'skip'ped commits left to test.\nThe first bad commit could be any of "
+                  f"(posterior {sum(self.posterior[g] for g in group):.1%}, {self.runner.runs} predicate runs):")
+            for g in group:
+                print(commits[g])
+            return None
+        print(f"{commits[k]} is the first bad commit (posterior {p:.1%}, {self.runner.runs} predicate runs)")
+        return commits[k]
+
+
+if __name__ == "__main__":
+    args, repo_path, good, bad, timeout = parse_cli_args(sys.argv[1:])
+    prior = None
+    if args.get('problem'):
+        prior = problem_prior(repo_path, bad, good, args['problem'],
+                              alpha=float(args.get('prior', 0.5)), first_parent=True)
+    NoisyBisector(repo_path, args['command'], good, bad,
+                  confidence=float(args.get('confidence', 0.95)),
+                  false_negative=float(args.get('false_negative', 0.1)),
+                  false_positive=float(args.get('false_positive', 0.01)),
+                  max_runs=int(args.get('max_runs', MAX_RUNS)),
+                  timeout=timeout, prior=prior).run()
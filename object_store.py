@@ -0,0 +1,171 @@
+import subprocess
+import threading
+
+
+WARM_BYTES = 64 * 1024 ** 2
+
+# Reads git objects through one long-lived `git cat-file --batch` process
+# (plus one `--batch-check` for metadata) so no read forks a new git.
+class CatFileObjectStore:
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.lock = threading.Lock()
+        self._batch = None
+        self._check = None
+        self.blobs = {}
+        self.blob_bytes = 0
+
+    def _start(self, mode):
+        return subprocess.Popen(["git", "cat-file", mode], cwd=self.repo_path,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def _request(self, proc, rev):
+        proc.stdin.write(rev.encode("utf-8") + b"\n")
+        proc.stdin.flush()
+        # "<rev> missing" echoes the rev, which may itself contain spaces.
+        line = proc.stdout.readline().rstrip(b"\n")
+        if not line or line.endswith((b" missing", b" ambiguous")):
+            return None
+        sha, obj_type, size = line.rsplit(b" ", 2)
+        return sha.decode(), obj_type.decode(), int(size)
+
+    def info(self, rev):
+        with self.lock:
+            if self._check is None:
+                self._check = self._start("--batch-check")
+            return self._request(self._check, rev)
+
+    def read(self, rev):
+        if rev in self.blobs:
+            return rev, "blob", self.blobs[rev]
+        with self.lock:
+            if self._batch is None:
+                self._batch = self._start("--batch")
+            header = self._request(self._batch, rev)
+            if header is None:
+                return None
+            sha, obj_type, size = header
+            data = self._batch.stdout.read(size)
+            self._batch.stdout.read(1)
+            return sha, obj_type, data
+
+    def warm(self, oids, max_bytes=WARM_BYTES):
+        # Objects are immutable, so blobs read once by id can be served from memory.
+        for oid in oids:
+            if oid in self.blobs:
+                continue
+            obj = self.read(oid)
+            if obj is None or obj[1] != "blob":
+                continue
+            if self.blob_bytes + len(obj[2]) > max_bytes:
+                break
+            self.blobs[oid] = obj[2]
+            self.blob_bytes += len(obj[2])
+        return len(self.blobs)
+
+    def close(self):
+        with self.lock:
+            for proc in (self._batch, self._check):
+                if proc is not None:
+                    proc.stdin.close()
+                    proc.wait()
+            self._batch = self._check = None
+
+    def blob(self, commit, path):
+        obj = self.read(f"{commit}:{path}")
+        if obj is None or obj[1] != "blob":
+            return None
+        return obj[2]
+
+    def text(self, commit, path):
+        data = self.blob(commit, path)
+        if data is None:
+            return None
+        return data.decode("utf-8", errors="ignore")
+
+    def tree(self, rev):
+        obj = self.read(rev)
+        if obj is None or obj[1] != "tree":
+            return None
+        return parse_tree(obj[2])
+
+    def commit(self, rev):
+        obj = self.read(rev)
+        if obj is None or obj[1] != "commit":
+            return None
+        return parse_commit(obj[0], obj[2])
+
+
+# Optional pure-Python backend; dulwich cannot lazily fetch promisor objects,
+# so it only suits full clones.
+class DulwichObjectStore(CatFileObjectStore):
+    def __init__(self, repo_path):
+        from dulwich.repo import Repo
+        super().__init__(repo_path)
+        self.repo = Repo(repo_path)
+
+    def _resolve(self, rev):
+        from dulwich.object_store import tree_lookup_path
+        commit, _, path = rev.partition(":")
+        try:
+            obj = self.repo[commit.encode()] if commit != "HEAD" else self.repo[self.repo.head()]
+            if path:
+                while obj.type_name == b"tag":
+                    obj = self.repo[obj.object[1]]
+                tree = obj.tree if obj.type_name == b"commit" else obj.id
+                _, sha = tree_lookup_path(self.repo.__getitem__, tree, path.encode())
+                obj = self.repo[sha]
+        except (KeyError, ValueError):
+            return None
+        return obj
+
+    def info(self, rev):
+        obj = self._resolve(rev)
+        if obj is None:
+            return None
+        return obj.id.decode(), obj.type_name.decode(), obj.raw_length()
+
+    def read(self, rev):
+        obj = self._resolve(rev)
+        if obj is None:
+            return None
+        return obj.id.decode(), obj.type_name.decode(), obj.as_raw_string()
+
+    def close(self):
+        self.repo.close()
+
+
+def parse_tree(data):
+    entries = []
+    pos = 0
+    while pos < len(data):
+        space = data.index(b" ", pos)
+        nul = data.index(b"\0", space)
+        mode = data[pos:space].decode()
+        name = data[space + 1:nul].decode("utf-8", errors="surrogateescape")
+        sha = data[nul + 1:nul + 21].hex()
+        entries.append((mode, name, sha))
+        pos = nul + 21
+    return entries
+
+
+def parse_commit(sha, data):
+    headers, _, message = data.partition(b"\n\n")
+    commit = {"sha": sha, "parents": [], "message": message.decode("utf-8", errors="ignore")}
+    for line in headers.decode("utf-8", errors="ignore").splitlines():
+        key, _, value = line.partition(" ")
+        if key == "parent":
+            commit["parents"].append(value)
+        elif key in ("tree", "author", "committer"):
+            commit[key] = value
+    return commit
+
+
+BACKENDS = {
+    "catfile": CatFileObjectStore,
+    "dulwich": DulwichObjectStore,
+}
+
+
+def open_object_store(repo_path, backend="catfile"):
+    return BACKENDS[backend](repo_path)
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import platform
+import threading
+import subprocess
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bisector", "predicates.sqlite")
+# Environment variables that change what a build or test does.
+ENV_KEYS = ("PATH", "PYTHONPATH", "VIRTUAL_ENV", "CC", "CXX", "CFLAGS", "LDFLAGS")
+
+
+def tree_key(repo_path, sha, paths=None):
+    # The tree (or, with paths, the tree/blob ids at those paths) is the same
+    # for a revert, a merge with no net change, or a docs-only commit.
+    if not paths:
+        cmd = ["git", "rev-parse", f"{sha}^{{tree}}"]
+    else:
+        cmd = ["git", "ls-tree", "--full-tree", sha, "--"] + list(paths)
+    result = subprocess.run(cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Cannot read tree of {sha}: {result.stderr.strip()}")
+    return hashlib.sha1(result.stdout.encode("utf-8")).hexdigest()
+
+
+def environment_fingerprint(keys=ENV_KEYS):
+    h = hashlib.sha256()
+    for part in (sys.version, platform.platform(), sys.executable):
+        h.update(part.encode("utf-8") + b"\0")
+    for key in keys:
+        h.update(f"{key}={os.environ.get(key, '')}".encode("utf-8") + b"\0")
+    return h.hexdigest()
+
+
+# Predicate outcomes keyed by (tree of the relevant paths, predicate
+# signature, environment fingerprint), kept on disk in sqlite. Only exit-code
+# outcomes are stored; a timeout is retried next time.
+class PredicateCache:
+    def __init__(self, path=None, paths=None, env_keys=ENV_KEYS):
+        self.path = path or os.environ.get("BISECTOR_PREDICATE_CACHE", DEFAULT_CACHE_PATH)
+        self.paths = paths
+        self.environment = environment_fingerprint(env_keys)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS outcomes ("
+                        "key TEXT PRIMARY KEY, mark TEXT, seconds REAL, created REAL)")
+        self.db.commit()
+
+    def key(self, repo_path, sha, signature):
+        h = hashlib.sha256()
+        for part in (tree_key(repo_path, sha, self.paths), signature, self.environment):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT mark FROM outcomes WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, mark, seconds):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?)", (key, mark, seconds, time.time()))
+            self.db.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
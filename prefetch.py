@@ -0,0 +1,71 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+# Runs analyses for the commits bisect may show next while the user is still
+# deciding. Results are looked up by key (the exact diff text), so a
+# speculation only counts if the step really needs that diff.
+class SpeculativePrefetcher:
+    def __init__(self, max_workers=2, budget=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.budget = budget
+        self.futures = {}
+        self.launched = 0
+        self.used = 0
+
+    def submit(self, key, fn, *args):
+        if key in self.futures:
+            return self.futures[key]
+        if self.budget is not None and self.launched >= self.budget:
+            return None
+        self.launched += 1
+        future = self.executor.submit(fn, *args)
+        self.futures[key] = future
+        return future
+
+    # One job for several keys, for summarizers that judge a batch of diffs
+    # faster than the same diffs one by one. jobs maps each key to its item;
+    # fn(*args, items) returns one result per item, in order.
+    def submit_batch(self, jobs, fn, *args):
+        jobs = {key: item for key, item in jobs.items() if key not in self.futures}
+        if self.budget is not None:
+            jobs = dict(list(jobs.items())[:max(self.budget - self.launched, 0)])
+        if not jobs:
+            return
+        self.launched += len(jobs)
+        futures = {key: Future() for key in jobs}
+        self.futures.update(futures)
+        self.executor.submit(self.run_batch, list(futures.values()), fn, *args, list(jobs.values()))
+
+    def run_batch(self, futures, fn, *args):
+        # A key discarded before the job starts is cancelled; once running it
+        # can no longer be, so every result below has somewhere to go.
+        live = [future.set_running_or_notify_cancel() for future in futures]
+        if not any(live):
+            return
+        try:
+            results = fn(*args)
+        except Exception as e:
+            for future, running in zip(futures, live):
+                if running:
+                    future.set_exception(e)
+            return
+        for future, running, result in zip(futures, live, results):
+            if running:
+                future.set_result(result)
+
+    def take(self, key):
+        future = self.futures.pop(key, None)
+        if future is not None:
+            self.used += 1
+        return future
+
+    def discard(self, keep=()):
+        for key in [k for k in self.futures if k not in keep]:
+            self.futures.pop(key).cancel()
+
+    def shutdown(self):
+        self.discard()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {"launched": self.launched, "used": self.used}
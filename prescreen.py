@@ -0,0 +1,131 @@
+import os
+import re
+import ast
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+
+SYNTAX_BROKEN = "syntax-broken"
+NON_SEMANTIC = "non-semantic"
+BATCH = 64
+
+TOKEN = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|(?P<comment>#[^\n]*|//[^\n]*|/\*.*?\*/)'
+                   r'|(?P<space>\s+)|\w+|[^\w\s]', re.DOTALL)
+HASH_COMMENTS = (".py", ".sh", ".rb", ".pl", ".yml", ".yaml", ".toml", ".cfg", ".ini", ".r")
+SLASH_COMMENTS = (".c", ".h", ".cc", ".cpp", ".hpp", ".java", ".js", ".ts", ".go", ".rs", ".cs", ".kt", ".swift")
+# Where the amount of whitespace between tokens never matters; in the second
+# group a line break can still end a statement. Every other file (YAML,
+# Makefiles, shell, ...) is compared byte for byte.
+FREE_FORM = (".c", ".h", ".cc", ".cpp", ".hpp", ".java", ".rs", ".cs")
+LINE_BREAKS = (".js", ".ts", ".go", ".kt", ".swift", ".toml", ".cfg", ".ini", ".r")
+
+
+def strip_docstrings(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], "value", None), ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+
+def tokens(path, text):
+    # Comments dropped and each run of whitespace reduced to one space (or
+    # one line break, where those matter), so "a - -b" still differs from
+    # "a --b".
+    ext = os.path.splitext(path)[1].lower()
+    out = []
+    for match in TOKEN.finditer(text):
+        comment, space = match.group("comment"), match.group("space")
+        if comment is not None:
+            if (comment.startswith("#") and ext in HASH_COMMENTS) or (not comment.startswith("#") and ext in SLASH_COMMENTS):
+                continue
+            out.append(" ".join(comment.split()))
+            continue
+        if space is not None:
+            space = "\n" if "\n" in space and ext in LINE_BREAKS else " "
+            if out and out[-1] in (" ", "\n"):
+                out[-1] = "\n" if "\n" in (out[-1], space) else " "
+            else:
+                out.append(space)
+            continue
+        out.append(match.group(0))
+    while out and out[-1] in (" ", "\n"):
+        out.pop()
+    return out[1:] if out and out[0] in (" ", "\n") else out
+
+
+# Runs in the worker processes: a digest of the file with formatting,
+# comments and (for Python) docstrings normalized away, where that is safe.
+def fingerprint(path, text):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".py":
+        try:
+            tree = ast.parse(text, filename=path)
+        except (SyntaxError, ValueError) as e:
+            return SYNTAX_BROKEN, f"{path}:{getattr(e, 'lineno', '?')}: {getattr(e, 'msg', e)}"
+        normalized = ast.dump(strip_docstrings(tree))
+    elif ext in FREE_FORM or ext in LINE_BREAKS:
+        normalized = "\0".join(tokens(path, text))
+    else:
+        normalized = text
+    return None, hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def fingerprint_job(job):
+    return fingerprint(*job)
+
+
+# Classifies each single-parent commit in a CommitGraph by comparing its
+# target files with its parent's before any model sees it:
+#   SYNTAX_BROKEN: a target Python file does not parse (untestable, skip)
+#   NON_SEMANTIC:  only whitespace, comments or docstrings changed, so the
+#                  commit behaves exactly like its parent
+# Every distinct blob is parsed once, in a process pool.
+class Prescreener:
+    def __init__(self, repo, workers=None):
+        self.repo = repo
+        self.workers = workers
+        self.fingerprints = {}
+
+    def fingerprint_blobs(self, blobs):
+        todo = [(path, sha) for path, sha in blobs if sha not in self.fingerprints]
+        if not todo:
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for start in range(0, len(todo), BATCH):
+                batch = todo[start:start + BATCH]
+                jobs = []
+                for path, sha in batch:
+                    obj = self.repo.objects.read(sha)
+                    jobs.append((path, obj[2].decode("utf-8", errors="ignore") if obj else ""))
+                for (path, sha), result in zip(batch, executor.map(fingerprint_job, jobs, chunksize=4)):
+                    self.fingerprints[sha] = result
+
+    def screen(self, graph):
+        pairs = {}
+        for sha in graph.shas:
+            commit = self.repo.objects.commit(sha)
+            if commit is None or len(commit["parents"]) != 1:
+                continue
+            pairs[sha] = (dict(self.repo.target_blobs(sha)), dict(self.repo.target_blobs(commit["parents"][0])))
+
+        changed = {(path, blob) for current, parent in pairs.values() for files in (current, parent)
+                   for path, blob in files.items() if current != parent}
+        self.fingerprint_blobs(sorted(changed))
+
+        results = {}
+        for sha, (current, parent) in pairs.items():
+            if current == parent:
+                results[sha] = (NON_SEMANTIC, "target files unchanged")
+                continue
+            broken = [self.fingerprints[blob][1] for blob in current.values() if self.fingerprints[blob][0]]
+            if broken:
+                results[sha] = (SYNTAX_BROKEN, "; ".join(broken))
+                continue
+            if current.keys() == parent.keys() and all(
+                    self.fingerprints[current[path]] == self.fingerprints[parent[path]] for path in current):
+                paths = sorted(path for path in current if current[path] != parent[path])
+                results[sha] = (NON_SEMANTIC, f"only formatting, comments or docstrings changed in {', '.join(paths)}")
+        return results
@@ -0,0 +1,168 @@
+import os
+import re
+from collections import Counter
+
+
+# Context windows in tokens; unknown models get the smallest common size.
+CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "o4-mini": 200000,
+    "microsoft/mai-ds-r1:free": 163840,
+    "deepseek-ai/deepseek-coder-1.3b-instruct": 16384,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+# Room left for the JSON answer, and a cap on the prompt itself so a huge
+# context window does not turn into a huge bill.
+OUTPUT_RESERVE = 2048
+MAX_PROMPT_TOKENS = 16000
+TOKENS_PER_MESSAGE = 4
+
+_ENCODINGS = {}
+
+
+def encoding_for(model):
+    if model not in _ENCODINGS:
+        try:
+            import tiktoken
+        except ImportError:
+            _ENCODINGS[model] = None
+            return None
+        try:
+            _ENCODINGS[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _ENCODINGS[model] = tiktoken.get_encoding("o200k_base")
+    return _ENCODINGS[model]
+
+
+def count_tokens(text, model=None):
+    encoding = encoding_for(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(messages, model=None):
+    return sum(count_tokens(m["content"], model) + TOKENS_PER_MESSAGE for m in messages)
+
+
+def prompt_budget(model):
+    window = CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    cap = int(os.getenv("BISECTOR_MAX_PROMPT_TOKENS", MAX_PROMPT_TOKENS))
+    return min(window - OUTPUT_RESERVE, cap)
+
+
+def terms(text):
+    # Identifiers are split on snake_case and camelCase so "sanitizeInput"
+    # matches a problem that talks about "sanitize input".
+    words = []
+    for word in re.findall(r"[A-Za-z][A-Za-z0-9_]*", text or ""):
+        for part in re.split(r"_|(?<=[a-z0-9])(?=[A-Z])", word):
+            if len(part) > 2:
+                words.append(part.lower())
+    return words
+
+
+def split_diff(diff_text):
+    # [(file header, [hunk, ...]), ...] in diff order. A file starts at a
+    # "--- " line followed by "+++ " and a hunk header, so a removed line
+    # that happens to start with "-- " is not taken for one.
+    lines = diff_text.splitlines()
+    files, pending = [], []
+    for k, line in enumerate(lines):
+        if line.startswith("--- ") and lines[k + 1:k + 2] and lines[k + 1].startswith("+++ ") \
+                and lines[k + 2:k + 3] and lines[k + 2].startswith("@@"):
+            files.append((pending + [line], []))
+            pending = []
+        elif files and not files[-1][1] and line.startswith("+++ "):
+            files[-1][0].append(line)
+        elif line.startswith("@@"):
+            if not files:
+                files.append((pending, []))
+                pending = []
+            files[-1][1].append([line])
+        elif files and files[-1][1]:
+            files[-1][1][-1].append(line)
+        else:
+            pending.append(line)
+    if pending or not files:
+        files.append((pending, []))
+    return [("\n".join(header), ["\n".join(hunk) for hunk in hunks]) for header, hunks in files]
+
+
+def relevance(hunk, problem_terms):
+    score = 0.0
+    for line in hunk.splitlines()[1:]:
+        changed = line[:1] in "+-~"
+        found = Counter(terms(line))
+        hits = sum(found[t] for t in problem_terms)
+        score += hits * (3.0 if changed else 1.0) + (0.1 if changed else 0.0)
+    return score
+
+
+def rank_hunks(hunks, problem):
+    problem_terms = set(terms(problem))
+    return sorted(range(len(hunks)), key=lambda k: (-relevance(hunks[k], problem_terms), k))
+
+
+def split_hunk(hunk, room, model):
+    # A hunk too large for one prompt is cut at line boundaries; every piece
+    # after the first repeats the hunk header so it still reads as a hunk.
+    lines = hunk.splitlines()
+    head = lines[0] + " (continued)"
+    pieces, piece, used = [], [lines[0]], count_tokens(lines[0], model) + 1
+    for line in lines[1:]:
+        cost = count_tokens(line, model) + 1
+        if used + cost > room and len(piece) > 1:
+            pieces.append("\n".join(piece))
+            piece, used = [head], count_tokens(head, model) + 1
+        piece.append(line)
+        used += cost
+    pieces.append("\n".join(piece))
+    return pieces
+
+
+# Splits a diff that does not fit `budget` tokens into diffs that do, losing
+# nothing: hunks are packed most relevant to `problem` first, hunks larger
+# than a prompt are cut into pieces, and each group shows its hunks in diff
+# order under their own file headers.
+def pack_diff(diff_text, problem, model, budget):
+    if count_tokens(diff_text, model) <= budget:
+        return [diff_text]
+    files = split_diff(diff_text)
+    headers = [count_tokens(header, model) + 1 for header, _ in files]
+    room = budget - max(headers) - 16
+    hunks, owners = [], []
+    for f, (_, file_hunks) in enumerate(files):
+        for hunk in file_hunks:
+            for piece in (split_hunk(hunk, room, model) if count_tokens(hunk, model) + 1 > room else [hunk]):
+                hunks.append(piece)
+                owners.append(f)
+    sizes = [count_tokens(hunk, model) + 1 for hunk in hunks]
+
+    # First fit; a group pays once for each file header it needs.
+    groups = []
+    for k in rank_hunks(hunks, problem):
+        for target in groups:
+            extra = sizes[k] + (0 if owners[k] in target["files"] else headers[owners[k]])
+            if target["size"] + extra <= budget - 16:
+                break
+        else:
+            target = {"size": 0, "hunks": [], "files": set()}
+            extra = sizes[k] + headers[owners[k]]
+            groups.append(target)
+        target["size"] += extra
+        target["hunks"].append(k)
+        target["files"].add(owners[k])
+
+    texts = []
+    for group in groups:
+        body = []
+        for f, (header, _) in enumerate(files):
+            kept = [hunks[k] for k in sorted(group["hunks"]) if owners[k] == f]
+            if kept:
+                body.append("\n".join([header] + kept) if header else "\n".join(kept))
+        texts.append("\n".join(body))
+    return texts
@@ -0,0 +1,83 @@
+import math
+import subprocess
+from collections import Counter
+
+from prompt_budget import terms
+
+
+COMMIT_MARKER = "\x1ecommit "
+DEFAULT_ALPHA = 0.5
+
+
+def run_log(repo_path, args, message=True):
+    fmt = f"{COMMIT_MARKER}%H%n%B" if message else f"{COMMIT_MARKER}%H"
+    cmd = ["git", "log", "--no-color", "--no-ext-diff", "--no-renames", f"--format={fmt}"] + args
+    result = subprocess.run(cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, errors="ignore")
+    if result.returncode != 0:
+        raise RuntimeError(f"git log failed: {result.stderr.strip()}")
+    for block in result.stdout.split(COMMIT_MARKER)[1:]:
+        sha, _, body = block.partition("\n")
+        yield sha, body
+
+
+def commit_documents(repo_path, bad, goods, paths=None, first_parent=False, hunk_paths=None):
+    # Each commit's message and the names of the files it touches, plus the
+    # added and removed lines under hunk_paths (`paths` when None). Names
+    # come from trees alone, so in a blob:none clone only the hunk_paths
+    # blobs need to be local; any other blob would be fetched one commit at
+    # a time. Renames are not detected for the same reason.
+    revs = (["--first-parent"] if first_parent else []) + [bad] + [f"^{g}" for g in goods]
+    docs = dict(run_log(repo_path, ["--name-only"] + revs + (["--"] + list(paths) if paths else [])))
+    hunk_paths = paths if hunk_paths is None else hunk_paths
+    args = ["-p", "--unified=0"] + revs + (["--"] + list(hunk_paths) if hunk_paths else [])
+    for sha, body in run_log(repo_path, args, message=False):
+        lines = []
+        for line in body.splitlines():
+            if line.startswith(("+++", "---", "diff --git", "index ", "@@")):
+                continue
+            lines.append(line[1:] if line[:1] in "+-" else line)
+        docs[sha] = docs.get(sha, "") + "\n" + "\n".join(lines)
+    return docs
+
+
+# Okapi BM25 over commit documents, tokenized like prompt_budget.terms.
+class BM25Index:
+    def __init__(self, docs, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.tf = {sha: Counter(terms(text)) for sha, text in docs.items()}
+        self.lengths = {sha: sum(tf.values()) for sha, tf in self.tf.items()}
+        self.avgdl = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0.0
+        self.df = Counter()
+        for tf in self.tf.values():
+            self.df.update(tf.keys())
+
+    def idf(self, term):
+        n, df = len(self.tf), self.df.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def scores(self, query):
+        query_terms = set(terms(query))
+        scores = {}
+        for sha, tf in self.tf.items():
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[sha] / self.avgdl) if self.avgdl else self.k1
+            scores[sha] = sum(self.idf(t) * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in query_terms if t in tf)
+        return scores
+
+
+def prior_from_scores(scores, alpha=DEFAULT_ALPHA):
+    # Mixes the normalized scores with a uniform prior, so a commit the index
+    # misses still keeps (1 - alpha) / n of the mass and bisect converges.
+    if not scores:
+        return {}
+    n, total = len(scores), sum(scores.values())
+    if total <= 0:
+        return {sha: 1.0 / n for sha in scores}
+    return {sha: (1 - alpha) / n + alpha * score / total for sha, score in scores.items()}
+
+
+def problem_prior(repo_path, bad, goods, problem, paths=None, alpha=DEFAULT_ALPHA, first_parent=False,
+                  hunk_paths=None):
+    docs = commit_documents(repo_path, bad, goods, paths, first_parent, hunk_paths)
+    return prior_from_scores(BM25Index(docs).scores(problem or ""), alpha)
@@ -1,143 +1,320 @@
 import os
-import threading
-from dotenv import load_dotenv
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from accelerate import init_empty_weights, load_checkpoint_and_dispatch
-import torch
-from openai import OpenAI
+import json
 import time
+import asyncio
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from verdict_cache import verdict_key
+from verdict import parse_verdict, merge_verdicts, VerdictError
+from prompt_budget import message_tokens, prompt_budget, pack_diff
+
+# Backends are imported only when selected, so the CLI and the web app do not
+# pay for openai (or local-model stacks) at startup.
+SUMMARIZERS = {
+    "gpt": "summarizer:GPTDiffSummarizer",
+    "openrouter": "summarizer:OpenRouterSummarizer",
+    "local": "local_summarizer:LocalHFSummarizer",
+    "ensemble": "ensemble:EnsembleSummarizer",
+}
+DEFAULT_SUMMARIZER = "gpt"
+# Hunk groups of an oversized diff judged at once.
+GROUP_WORKERS = 8
+
+
+def register_summarizer(name, target):
+    SUMMARIZERS[name] = target
+
+
+def get_summarizer_class(name=None):
+    name = name or os.getenv("BISECTOR_SUMMARIZER", DEFAULT_SUMMARIZER)
+    if name not in SUMMARIZERS:
+        raise ValueError(f"Unknown summarizer '{name}', choose from: {', '.join(sorted(SUMMARIZERS))}")
+    module_name, _, class_name = SUMMARIZERS[name].partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_summarizer(name, problem, **kwargs):
+    return get_summarizer_class(name)(problem, **kwargs)
+
 
 class DiffSummarizer:
+    model = None
+    provider = None
+    prompt_version = 1
+    # Whether answers can be streamed as they are generated.
+    incremental = True
+    # Whether the same prompt always gets the same answer (greedy decoding).
+    deterministic = False
+    label = "GPT"
+    error_result = 'No Changes.'
 
-    def summarize(self, diff_text):
-        raise NotImplementedError("Must implement summarize method")
+    def __init__(self, cache=None, streaming=False, pool=None):
+        self.cache = cache
+        self.streaming = streaming
+        self.pool = pool
 
+    def messages(self, diff_text):
+        raise NotImplementedError("Must implement messages method")
+
+    def parts(self, diff_text):
+        overhead = message_tokens(self.messages(""), self.model)
+        return pack_diff(diff_text, getattr(self, "problem", None), self.model, prompt_budget(self.model) - overhead)
+
+    def complete(self, diff_text):
+        parts = self.parts(diff_text)
+        if len(parts) == 1:
+            return self.request(parts[0])
+        # Too large for one prompt: judge hunk groups in parallel, then reduce.
+        print(f"[{self.label}] Diff exceeds the prompt budget, summarizing {len(parts)} hunk groups")
+        with ThreadPoolExecutor(max_workers=min(len(parts), GROUP_WORKERS), thread_name_prefix="hunks") as executor:
+            answers = list(executor.map(self.request, parts))
+        return self.reduce(parts, answers)
+
+    async def acomplete(self, parts):
+        # complete() over self.parts(diff_text) as a task on the pool's loop,
+        # so callers can cancel the requests it has in flight.
+        answers = await asyncio.gather(*(self.pool.hedged(self.provider, self.model, self.messages(part))
+                                         for part in parts))
+        if len(parts) == 1:
+            return answers[0]
+        return self.reduce(parts, answers)
+
+    def reduce(self, parts, answers):
+        # A hunk group without a verdict may hold the change that matters, so
+        # the merged verdict would claim more than the model said.
+        verdicts, dropped = [], []
+        for k, answer in enumerate(answers):
+            try:
+                verdicts.append(parse_verdict(answer))
+            except VerdictError as e:
+                print(f"[{self.label}] Part {k + 1} dropped: {e}")
+                dropped.append(str(k + 1))
+        if dropped:
+            raise VerdictError(f"No usable verdict for hunk group(s) {', '.join(dropped)} of {len(parts)}")
+        result = merge_verdicts(verdicts).to_dict()
+        result["parts"] = len(parts)
+        return json.dumps(result, indent=2)
+
+    def request(self, diff_text):
+        if self.pool is not None:
+            return self.pool.complete(self.provider, self.model, self.messages(diff_text))
+        response = self.client.chat.completions.create(model=self.model, messages=self.messages(diff_text))
+        return response.choices[0].message.content
+
+    def deltas(self, diff_text):
+        if self.pool is not None:
+            yield from self.pool.stream(self.provider, self.model, self.messages(diff_text))
+            return
+        response = self.client.chat.completions.create(model=self.model, messages=self.messages(diff_text), stream=True)
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            response.close()
+
+    def stream(self, diff_text):
+        cached = self.cached(diff_text)
+        if cached is not None:
+            yield cached
+            return
+        yield from self.generate(diff_text)
+
+    def generate(self, diff_text):
+        # The uncached half of stream(), for callers that already looked.
+        if not self.incremental or len(self.parts(diff_text)) > 1:
+            content = self.complete(diff_text)
+            self.store(diff_text, content)
+            yield content
+            return
+        parts = []
+        deltas = self.deltas(diff_text)
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                yield delta
+        finally:
+            # Closing early (Ctrl-C, browser disconnect) drops the HTTP stream; partial output is not cached.
+            deltas.close()
+        self.store(diff_text, "".join(parts))
+
+    def print_stream(self, diff_text):
+        parts = []
+        chunks = self.generate(diff_text)
+        try:
+            for delta in chunks:
+                print(delta, end="", flush=True)
+                parts.append(delta)
+        except KeyboardInterrupt:
+            chunks.close()
+            print("\n[Summary cancelled]", end="")
+        print()
+        return "".join(parts)
+
+    def analyse(self, diff_text):
+        cached = self.cached(diff_text)
+        if cached is not None:
+            return cached
+        content = self.complete(diff_text)
+        self.store(diff_text, content)
+        return content
+
+    def analyse_batch(self, diffs):
+        if len(diffs) < 2:
+            return [self.analyse(diff) for diff in diffs]
+        with ThreadPoolExecutor(max_workers=len(diffs), thread_name_prefix="batch") as executor:
+            return list(executor.map(self.analyse, diffs))
 
-class GPTDiffSummarizer(DiffSummarizer):
-    def __init__(self, problem):
-        super().__init__()
-        self.problem = problem
-        load_dotenv()  # Load variables from .env
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.client = OpenAI(api_key=api_key)
-        
     def summarize(self, diff_text):
         if not diff_text or not diff_text.strip() or diff_text.strip() == "No changes.":
             return
-        
-        
+
+        cached = self.cached(diff_text)
+        if cached is not None:
+            print(f"--- {self.label} Summary (cached) ---")
+            print(cached)
+            return cached
+
         try:
-            client = self.client
-            print("--- GPT Summary ---")
+            print(f"--- {self.label} Summary ---")
             cur = time.time()
-            response = client.chat.completions.create(
-                # model="gpt-4",
-                model="gpt-4.1",
-                # model="o4-mini",
-
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are an expert code-analysis assistant guiding a git-bisect session. "
-                            "Analyse each diff with the eight-step behaviour rubric below and "
-                            "return ONLY the requested JSON. "
-                            "Using the hypotheses above, decide behaviour_change.  Map that decision to bisect_mark (\"good\" or \"bad\") per the table and include it in the JSON."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content":
-                            f"target_behaviour: {self.problem}\n\n"
-                            "Return JSON with the following keys:\n"
-                            "has_compile_error: <bool>\n"
-                            "behaviour_change: \"introduces|removes|modifies|no-effect\"\n"
-                            "behaviour_confidence: <0-100>\n"
-                            "sem_edits: [  # list of objects generated via Steps 1-4 above\n"
-                            "  {id:int, kind:str, semantic:bool, behaviour:str, likelihood:int,\n"
-                            "   dependency:str, precedent:str}\n"
-                            "]\n"
-                            "counterfactual_fix: <string>\n"
-                            "reasoning_chain: [\"step1\",\"step2\",\"step3\"]\n"
-                            "reflection: <string>\n"
-                            "\nRubric questions:\n"
-                            "1️⃣ Enumerate edits …\n2️⃣ Mark semantic …\n3️⃣ Hypothesise behaviour …\n"
-                            "4️⃣ List dependencies …\n5️⃣ Precedent …\n6️⃣ Counter-factual …\n"
-                            "7️⃣ Give verdict …\n8️⃣ Confidence & reflection …\n"
-                            "bisect_mark: good | bad"
-                            "\n--- BEGIN DIFF ---\n"
-                            + diff_text +
-                            "\n--- END DIFF ---"
-                    }
-                    ]
-            )
-            print(response.choices[0].message.content)
+            if self.streaming:
+                content = self.print_stream(diff_text)
+            else:
+                content = self.complete(diff_text)
+                print(content)
+                self.store(diff_text, content)
             print("Time taken:", time.time() - cur)
-            return response.choices[0].message.content
+            return content
         except Exception as e:
-            print(f"[GPT Error] {e}")
-        return 'No Changes.'
+            print(f"[{self.label} Error] {e}")
+        return self.error_result
+
+    def cache_key(self, diff_text):
+        return verdict_key(diff_text, getattr(self, "problem", None), self.model,
+                           f"{type(self).__name__}-{self.prompt_version}")
+
+    def cached(self, diff_text):
+        if self.cache is None:
+            return None
+        return self.cache.get(self.cache_key(diff_text))
+
+    def store(self, diff_text, response):
+        # An empty answer (a stream that produced no deltas) is not a verdict.
+        if self.cache is not None and response:
+            self.cache.put(self.cache_key(diff_text), self.model, response)
+
+
+class GPTDiffSummarizer(DiffSummarizer):
+    # model="gpt-4", model="o4-mini"
+    model = "gpt-4.1"
+    provider = "openai"
+    prompt_version = 2
+
+    def __init__(self, problem, cache=None, streaming=False, pool=None):
+        super().__init__(cache, streaming, pool)
+        self.problem = problem
+        if pool is None:
+            from dotenv import load_dotenv
+            from openai import OpenAI
+            load_dotenv()  # Load variables from .env
+            api_key = os.getenv("OPENAI_API_KEY")
+            self.client = OpenAI(api_key=api_key)
+
+    def messages(self, diff_text):
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You are an expert code-analysis assistant guiding a git-bisect session. "
+                    "Analyse each diff with the eight-step behaviour rubric below and "
+                    "return ONLY the requested JSON. "
+                    "Map the verdict to bisect_mark: \"bad\" if the target behaviour is already "
+                    "present after this diff, otherwise \"good\"."
+                )
+            },
+            {
+                "role": "user",
+                "content":
+                    f"target_behaviour: {self.problem}\n\n"
+                    "Return JSON with the following keys:\n"
+                    "bisect_mark: \"good|bad\"\n"
+                    "has_compile_error: <bool>\n"
+                    "behaviour_change: \"introduces|removes|modifies|no-effect\"\n"
+                    "behaviour_confidence: <0-100>\n"
+                    "sem_edits: [  # list of objects generated via Steps 1-4 above\n"
+                    "  {id:int, kind:str, semantic:bool, behaviour:str, likelihood:int,\n"
+                    "   dependency:str, precedent:str}\n"
+                    "]\n"
+                    "counterfactual_fix: <string>\n"
+                    "reasoning_chain: [\"step1\",\"step2\",\"step3\"]\n"
+                    "reflection: <string>\n"
+                    "\nRubric questions:\n"
+                    "1️⃣ Enumerate edits …\n2️⃣ Mark semantic …\n3️⃣ Hypothesise behaviour …\n"
+                    "4️⃣ List dependencies …\n5️⃣ Precedent …\n6️⃣ Counter-factual …\n"
+                    "7️⃣ Give verdict …\n8️⃣ Confidence & reflection …\n"
+                    "\n--- BEGIN DIFF ---\n"
+                    + diff_text +
+                    "\n--- END DIFF ---"
+            }
+        ]
 
 
 class OpenRouterSummarizer(DiffSummarizer):
-    def __init__(self, problem):
-        super().__init__()
+    model = "microsoft/mai-ds-r1:free"
+    label = "Open Router"
+    provider = "openrouter"
+    error_result = 'No changes.'
+    prompt_version = 2
+
+    def __init__(self, problem, cache=None, streaming=False, pool=None):
+        super().__init__(cache, streaming, pool)
         self.problem = problem
-        load_dotenv()  # Load variables from .env
-        api_key = os.getenv("OEPNROUTER_API_KEY")
-        self.client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=api_key)
-        
-    def summarize(self, diff_text):
-        if not diff_text or not diff_text.strip() or diff_text.strip() == "No changes.":
-            return
-        try:
-            client = self.client
-            print("--- GPT Summary ---")
-            cur = time.time()
-            response = client.chat.completions.create(
-                # model="gpt-4",
-                model="microsoft/mai-ds-r1:free",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are an expert code-analysis assistant guiding a git-bisect session. "
-                            "Analyse each diff with the eight-step behaviour rubric below and "
-                            "return ONLY the requested JSON."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content":
-                            f"target_behaviour: {self.problem}\n\n"
-                            "Return JSON with the following keys:\n"
-                            "has_compile_error: <bool>\n"
-                            "behaviour_change: \"introduces|removes|modifies|no-effect\"\n"
-                            "behaviour_confidence: <0-100>\n"
-                            "sem_edits: [  # list of objects generated via Steps 1-4 above\n"
-                            "  {id:int, kind:str, semantic:bool, behaviour:str, likelihood:int,\n"
-                            "   dependency:str, precedent:str}\n"
-                            "]\n"
-                            "counterfactual_fix: <string>\n"
-                            "reasoning_chain: [\"step1\",\"step2\",\"step3\"]\n"
-                            "reflection: <string>\n"
-                            "\nRubric questions:\n"
-                            "1️⃣ Enumerate edits …\n2️⃣ Mark semantic …\n3️⃣ Hypothesise behaviour …\n"
-                            "4️⃣ List dependencies …\n5️⃣ Precedent …\n6️⃣ Counter-factual …\n"
-                            "7️⃣ Give verdict …\n8️⃣ Confidence & reflection …\n"
-                            "\n--- BEGIN DIFF ---\n"
-                            + diff_text +
-                            "\n--- END DIFF ---"
-                    }
-                    ]
-            )
-            print(self.problem)
-            print(response.choices[0].message.content)
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"[Open Router Error] {e}")
-        return 'No changes.'
-        
+        if pool is None:
+            from dotenv import load_dotenv
+            from openai import OpenAI
+            load_dotenv()  # Load variables from .env
+            api_key = os.getenv("OEPNROUTER_API_KEY")
+            self.client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=api_key)
+
+    def messages(self, diff_text):
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You are an expert code-analysis assistant guiding a git-bisect session. "
+                    "Analyse each diff with the eight-step behaviour rubric below and "
+                    "return ONLY the requested JSON. "
+                    "Map the verdict to bisect_mark: \"bad\" if the target behaviour is already "
+                    "present after this diff, otherwise \"good\"."
+                )
+            },
+            {
+                "role": "user",
+                "content":
+                    f"target_behaviour: {self.problem}\n\n"
+                    "Return JSON with the following keys:\n"
+                    "bisect_mark: \"good|bad\"\n"
+                    "has_compile_error: <bool>\n"
+                    "behaviour_change: \"introduces|removes|modifies|no-effect\"\n"
+                    "behaviour_confidence: <0-100>\n"
+                    "sem_edits: [  # list of objects generated via Steps 1-4 above\n"
+                    "  {id:int, kind:str, semantic:bool, behaviour:str, likelihood:int,\n"
+                    "   dependency:str, precedent:str}\n"
+                    "]\n"
+                    "counterfactual_fix: <string>\n"
+                    "reasoning_chain: [\"step1\",\"step2\",\"step3\"]\n"
+                    "reflection: <string>\n"
+                    "\nRubric questions:\n"
+                    "1️⃣ Enumerate edits …\n2️⃣ Mark semantic …\n3️⃣ Hypothesise behaviour …\n"
+                    "4️⃣ List dependencies …\n5️⃣ Precedent …\n6️⃣ Counter-factual …\n"
+                    "7️⃣ Give verdict …\n8️⃣ Confidence & reflection …\n"
+                    "\n--- BEGIN DIFF ---\n"
+                    + diff_text +
+                    "\n--- END DIFF ---"
+            }
+        ]
+
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,128 @@
+import re
+import json
+
+
+BEHAVIOUR_CHANGES = ("introduces", "removes", "modifies", "no-effect")
+BISECT_MARKS = ("good", "bad")
+
+
+class VerdictError(ValueError):
+    pass
+
+
+# The structured answer the rubric prompt asks for, validated field by field.
+class Verdict:
+    def __init__(self, bisect_mark, behaviour_confidence, has_compile_error, behaviour_change=None,
+                 sem_edits=None, counterfactual_fix=None, reasoning_chain=None, reflection=None, raw=None):
+        self.bisect_mark = bisect_mark
+        self.behaviour_confidence = behaviour_confidence
+        self.has_compile_error = has_compile_error
+        self.behaviour_change = behaviour_change
+        self.sem_edits = sem_edits or []
+        self.counterfactual_fix = counterfactual_fix
+        self.reasoning_chain = reasoning_chain or []
+        self.reflection = reflection
+        self.raw = raw
+
+    def to_dict(self):
+        return {
+            "bisect_mark": self.bisect_mark,
+            "behaviour_confidence": self.behaviour_confidence,
+            "has_compile_error": self.has_compile_error,
+            "behaviour_change": self.behaviour_change,
+            "sem_edits": self.sem_edits,
+            "counterfactual_fix": self.counterfactual_fix,
+            "reasoning_chain": self.reasoning_chain,
+            "reflection": self.reflection,
+        }
+
+    def __repr__(self):
+        return (f"Verdict(bisect_mark={self.bisect_mark!r}, behaviour_confidence={self.behaviour_confidence}, "
+                f"has_compile_error={self.has_compile_error})")
+
+
+def extract_json(text):
+    if not text:
+        raise VerdictError("Empty response")
+    fenced = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, re.DOTALL)
+    candidate = fenced.group(1) if fenced else text[text.find("{"):text.rfind("}") + 1]
+    if not candidate:
+        raise VerdictError("No JSON object in response")
+    try:
+        data = json.loads(candidate)
+    except json.JSONDecodeError as e:
+        raise VerdictError(f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise VerdictError("Response JSON is not an object")
+    return data
+
+
+def parse_confidence(value):
+    if isinstance(value, bool):
+        raise VerdictError("behaviour_confidence must be a number")
+    if isinstance(value, str) and re.fullmatch(r"\s*\d+(\.\d+)?\s*%?\s*", value):
+        value = float(value.strip().rstrip("%"))
+    if not isinstance(value, (int, float)) or not 0 <= value <= 100:
+        raise VerdictError(f"behaviour_confidence out of range: {value!r}")
+    return float(value)
+
+
+def parse_verdict(text):
+    data = extract_json(text)
+
+    mark = str(data.get("bisect_mark", "")).strip().lower()
+    if mark not in BISECT_MARKS:
+        raise VerdictError(f"bisect_mark must be one of {BISECT_MARKS}, got {data.get('bisect_mark')!r}")
+
+    compile_error = data.get("has_compile_error")
+    if not isinstance(compile_error, bool):
+        raise VerdictError(f"has_compile_error must be a boolean, got {compile_error!r}")
+
+    change = data.get("behaviour_change")
+    if change is not None:
+        change = str(change).strip().lower()
+        if change not in BEHAVIOUR_CHANGES:
+            raise VerdictError(f"behaviour_change must be one of {BEHAVIOUR_CHANGES}, got {change!r}")
+
+    return Verdict(
+        bisect_mark=mark,
+        behaviour_confidence=parse_confidence(data.get("behaviour_confidence")),
+        has_compile_error=compile_error,
+        behaviour_change=change,
+        sem_edits=data.get("sem_edits") if isinstance(data.get("sem_edits"), list) else [],
+        counterfactual_fix=data.get("counterfactual_fix"),
+        reasoning_chain=data.get("reasoning_chain") if isinstance(data.get("reasoning_chain"), list) else [],
+        reflection=data.get("reflection"),
+        raw=text,
+    )
+
+
+# Reduces verdicts on disjoint parts of one diff: the version is bad as soon
+# as any part introduces the behaviour, and good only when every part agrees.
+def merge_verdicts(verdicts):
+    if not verdicts:
+        raise VerdictError("No verdicts to merge")
+    bad = [v for v in verdicts if v.bisect_mark == "bad"]
+    if bad:
+        lead = max(bad, key=lambda v: v.behaviour_confidence)
+        confidence = lead.behaviour_confidence
+    else:
+        lead = min(verdicts, key=lambda v: v.behaviour_confidence)
+        confidence = lead.behaviour_confidence
+    sem_edits = []
+    for v in verdicts:
+        for edit in v.sem_edits:
+            edit = dict(edit) if isinstance(edit, dict) else {"behaviour": edit}
+            edit["id"] = len(sem_edits) + 1
+            sem_edits.append(edit)
+    n = len(verdicts)
+    return Verdict(
+        bisect_mark=lead.bisect_mark,
+        behaviour_confidence=confidence,
+        has_compile_error=any(v.has_compile_error for v in verdicts),
+        behaviour_change=lead.behaviour_change,
+        sem_edits=sem_edits,
+        counterfactual_fix=lead.counterfactual_fix,
+        reasoning_chain=[f"part {k + 1}/{n}: {step}" for k, v in enumerate(verdicts) for step in v.reasoning_chain],
+        reflection=lead.reflection,
+    )
@@ -0,0 +1,82 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bisector", "verdicts.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+def verdict_key(content, problem, model, prompt_version):
+    h = hashlib.sha256()
+    for part in (content, problem or "", model or "", str(prompt_version)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+# Raw model responses keyed by (diff/blob, problem, model, prompt version),
+# kept on disk in sqlite and trimmed least-recently-used first.
+class VerdictCache:
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or os.environ.get("BISECTOR_VERDICT_CACHE", DEFAULT_CACHE_PATH)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS verdicts ("
+                        "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, "
+                        "created REAL, last_used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used)")
+        self.db.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT response FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+            return row[0]
+
+    def put(self, key, model, response):
+        if response is None:
+            return
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)",
+                            (key, model, response, len(response.encode("utf-8")), now, now))
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM verdicts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM verdicts ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM verdicts").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self.lock:
+            self.db.close()
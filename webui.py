@@ -1,10 +1,21 @@
 # app.py
 import os
+import glob
+import json
 import shutil
 import stat
 import subprocess
-from flask import Flask, render_template, request, redirect, url_for, session
-from summarizer import OpenRouterSummarizer, GPTDiffSummarizer
+import time
+from flask import Flask, Response, jsonify, render_template, request, redirect, url_for, session, stream_with_context
+from summarizer import get_summarizer
+from client_pool import shared_pool
+from mirror_cache import MirrorCache
+from object_store import open_object_store
+from diffing import annotated_diff
+from verdict_cache import VerdictCache
+from jobs import JobRunner, SessionStore
+from journal import Journal
+from verdict import parse_verdict, VerdictError
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key"  # needed for session
@@ -13,14 +24,38 @@ app.secret_key = "your_secret_key"  # needed for session
 DEFAULT_REPO_PATH = "C:\\Users\\eugen\\Documents\\testground"
 DEFAULT_TARGET_PATH = "game.py"
 TEMP_DIR_NAME = "tmp"
+MIRRORS = MirrorCache()
+VERDICTS = VerdictCache()
+SUMMARIZER = os.environ.get("BISECTOR_SUMMARIZER", "gpt")
+JOBS = JobRunner(int(os.environ.get("BISECTOR_WEB_WORKERS", 4)))
+SESSIONS = SessionStore()
+# Session fields written to each session's journal and restored on startup.
+JOURNALED = ("repo_url", "target_path", "problem", "repo_path", "mirror_path")
 
 
 # --- Classes ---
 class RepoManager:
-    def __init__(self, repo_path, target_path):
+    def __init__(self, repo_path, target_path, session_id):
         self.repo_path = repo_path
         self.target_path = target_path
-        self.work_path = os.path.join(repo_path, TEMP_DIR_NAME)
+        self.work_path = os.path.join(repo_path, TEMP_DIR_NAME, session_id)
+        self.mirrors = MIRRORS
+        self.mirror_path = None
+        self._objects = None
+
+    @property
+    def objects(self):
+        if self._objects is None:
+            self._objects = open_object_store(self.work_path)
+        return self._objects
+
+    def read_file(self, commit, path=None):
+        return self.objects.text(commit, path or self.target_path)
+
+    def close(self):
+        if self._objects is not None:
+            self._objects.close()
+            self._objects = None
 
     def run_cmd(self, cmd, work_path=None):
         if work_path is None:
@@ -36,18 +71,16 @@ class RepoManager:
         func(path)
 
     def remove_repo(self):
+        self.close()
+        self.mirrors.remove_worktree(self.mirror_path, self.work_path)
         if os.path.exists(self.work_path):
             shutil.rmtree(self.work_path, onerror=self.force_remove_readonly)
 
     def sparse_checkout(self, repo_url):
+        self.mirror_path = self.mirrors.mirror_path(repo_url)
         self.remove_repo()
-        subprocess.run(f"git clone --filter=blob:none --no-checkout {repo_url} {self.work_path}", shell=True, check=True)
-        subprocess.run("git sparse-checkout init --cone", cwd=self.work_path, shell=True, check=True)
-        subprocess.run(f"git sparse-checkout set {self.target_path}", cwd=self.work_path, shell=True, check=True)
-        try:
-            subprocess.run("git checkout main", cwd=self.work_path, shell=True, check=True)
-        except subprocess.CalledProcessError:
-            subprocess.run("git checkout master", cwd=self.work_path, shell=True, check=True)
+        self.mirror_path = self.mirrors.add_worktree(repo_url, self.work_path, self.target_path)
+        self.mirrors.prefetch_blobs(self.mirror_path, ["HEAD"], [self.target_path])
 
 
 class BisectSession:
@@ -56,16 +89,15 @@ class BisectSession:
         self.summarizer = summarizer
         self.previous_content = ''
 
-    def diff_and_summarize(self):
-        target_file = os.path.join(self.repo.work_path, self.repo.target_path)
-        if not os.path.isfile(target_file):
+    def diff_and_summarize(self, commit="HEAD", previous_commit=None):
+        current_content = self.repo.read_file(commit)
+        if current_content is None:
             return "[File not found]", ""
 
-        with open(target_file, 'r', encoding='utf-8', errors='ignore') as f:
-            current_content = f.read()
-
-        diff_text = current_content
-        return current_content
+        previous_content = self.repo.read_file(previous_commit) if previous_commit else ""
+        diff_text = annotated_diff(previous_content, current_content,
+                                   fromfile=f"previous/{self.repo.target_path}", tofile=f"current/{self.repo.target_path}")
+        return diff_text or "No changes."
     
     def get_summary(self, diff_text):
         return self.summarizer.summarize(diff_text)
@@ -80,84 +112,216 @@ class BisectSession:
         return False, None
 
 
+# --- Jobs ---
+def prepare_session(job, state):
+    repo = RepoManager(state['repo_path'], state['target_path'], state['id'])
+    job.progress(f"Preparing mirror and worktree for {state['repo_url']}")
+    repo.sparse_checkout(state['repo_url'])
+    job.progress("Starting bisect")
+    head_commit, _, _ = repo.run_cmd("git rev-parse HEAD")
+    root_commit, _, _ = repo.run_cmd("git rev-list --max-parents=0 HEAD")
+    repo.run_cmd(f"git bisect start {head_commit} {root_commit}")
+    with state['lock']:
+        state['mirror_path'] = repo.mirror_path
+        state['previous_commit'] = root_commit.split()[0]
+        state['bisect_finished'] = False
+        session_journal(state).start(sid=state['id'], head=head_commit, roots=root_commit.split(),
+                                     **{key: state[key] for key in JOURNALED})
+    if state.get('cancelled'):
+        end_session(state)
+        return
+    job.progress("Ready")
+
+
+def session_journal(state):
+    return Journal(os.path.join(state['repo_path'], TEMP_DIR_NAME, f"{state['id']}.jsonl"))
+
+
+def restore_sessions(repo_path=DEFAULT_REPO_PATH):
+    # Sessions whose worktree survived a restart come back under the same id,
+    # so a browser still holding the cookie carries on where it left off.
+    for path in glob.glob(os.path.join(repo_path, TEMP_DIR_NAME, "*.jsonl")):
+        meta, steps = Journal(path).session()
+        if meta is None or SESSIONS.get(meta['sid']) is not None:
+            continue
+        if not os.path.isdir(os.path.join(repo_path, TEMP_DIR_NAME, meta['sid'])):
+            os.remove(path)
+            continue
+        last = steps[-1] if steps else {}
+        SESSIONS.create(
+            sid=meta['sid'],
+            previous_commit=last.get('commit', meta['roots'][0]),
+            bisect_finished=bool(last.get('first_bad')),
+            bad_commit=last.get('first_bad'),
+            **{key: meta[key] for key in JOURNALED},
+        )
+
+
+def open_repo(state):
+    repo = RepoManager(state['repo_path'], state['target_path'], state['id'])
+    repo.mirror_path = state.get('mirror_path') or MIRRORS.mirror_path(state['repo_url'])
+    return repo
+
+
+def end_session(state):
+    JOBS.forget(state['id'])
+    repo = open_repo(state)
+    repo.run_cmd("git bisect reset")
+    repo.remove_repo()
+    journal = session_journal(state)
+    if os.path.exists(journal.path):
+        os.remove(journal.path)
+
+
+def note_summary(state, summary, started):
+    # Kept with the commit on screen so the user's mark is journaled with the
+    # verdict and timings, as the CLI does.
+    with state['lock']:
+        shown = state.get('shown')
+        if shown is not None:
+            shown['summary'] = summary
+            shown['summary_seconds'] = round(time.time() - started, 3)
+            shown['summarized_at'] = time.time()
+
+
+def shown_step(state, commit):
+    shown = state.get('shown') or {}
+    if shown.get('commit') != commit:
+        return None, {}
+    verdict = None
+    if shown.get('summary'):
+        try:
+            verdict = parse_verdict(shown['summary'])
+        except VerdictError:
+            pass
+    if 'summarized_at' in shown:
+        timings = {"summary": shown['summary_seconds'], "decision": round(time.time() - shown['summarized_at'], 3)}
+    else:
+        timings = {"decision": round(time.time() - shown['at'], 3)}
+    return verdict, timings
+
+
+def current_state():
+    return SESSIONS.get(session.get('sid'))
+
+
 # --- Routes ---
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
-        session['repo_url'] = request.form['repo_url']
-        session['target_path'] = request.form['target_path']
-        session['problem'] = request.form['problem']
-
-        session['repo_path'] = DEFAULT_REPO_PATH
-        session['bisect_started'] = False
-
+        for state in SESSIONS.expire():
+            end_session(state)
+        sid = SESSIONS.create(
+            repo_url=request.form['repo_url'],
+            target_path=request.form['target_path'],
+            problem=request.form['problem'],
+            repo_path=DEFAULT_REPO_PATH,
+            bisect_finished=False,
+        )
+        session.clear()
+        session['sid'] = sid
+        JOBS.submit(sid, prepare_session, SESSIONS.get(sid))
         return redirect(url_for('bisect'))
 
     return render_template("index.html")
 
 
+@app.route("/progress")
+def progress():
+    state = current_state()
+    job = JOBS.get(state['id']) if state else None
+    if job is None:
+        return jsonify({"status": "missing"}), 404
+    data = job.to_dict()
+    data["position"] = JOBS.position(job.id)
+    return jsonify(data)
+
+
 @app.route("/bisect", methods=["GET", "POST"])
 def bisect():
-    repo_url = session.get('repo_url')
-    target_path = session.get('target_path')
-    problem = session.get('problem')
-    repo_path = session.get('repo_path')
-
-    repo = RepoManager(repo_path, target_path)
-    summarizer = OpenRouterSummarizer(problem)
-    bisect = BisectSession(repo, summarizer)
-
-    if not session.get('bisect_started'):
-        repo.sparse_checkout(repo_url)
-        head_commit, _, _ = repo.run_cmd("git rev-parse HEAD")
-        root_commit, _, _ = repo.run_cmd("git rev-list --max-parents=0 HEAD")
-        repo.run_cmd(f"git bisect start {head_commit} {root_commit}")
-        session['bisect_started'] = True
-        session['bisect_finished'] = False
-
-    if request.method == "POST" and not session.get('bisect_finished'):
-        feedback = request.form.get("feedback")
-        if feedback == "cancel":
-            repo.run_cmd("git bisect reset")
-            repo.remove_repo()
+    state = current_state()
+    if state is None:
+        session.clear()
+        return redirect(url_for('index'))
+
+    job = JOBS.get(state['id'])
+    if job is not None and job.status != "done":
+        if request.method == "POST" and request.form.get("feedback") == "cancel":
+            SESSIONS.drop(state['id'])
+            state['cancelled'] = True
+            if job.status == "failed":
+                end_session(state)
             session.clear()
             return redirect(url_for('index'))
+        return render_template("preparing.html", job=job.to_dict(), repo_url=state['repo_url'])
+
+    with state['lock']:
+        repo = open_repo(state)
+        bisect = BisectSession(repo, None)
 
-        finished, bad_commit = bisect.git_bisect_step(feedback)
-        if finished:
-            session['bisect_finished'] = True
-            session['bad_commit'] = bad_commit
-            print(f"First bad commit found: {bad_commit}")
+        feedback = request.form.get("feedback") if request.method == "POST" else None
+        if feedback == "cancel":
+            end_session(SESSIONS.drop(state['id']))
+            session.clear()
+            return redirect(url_for('index'))
 
-    current_commit, _, _ = repo.run_cmd("git rev-parse HEAD")
-    file_content = bisect.diff_and_summarize()
+        if feedback and not state.get('bisect_finished'):
+            state['previous_commit'], _, _ = repo.run_cmd("git rev-parse HEAD")
+            verdict, timings = shown_step(state, state['previous_commit'])
+            finished, bad_commit = bisect.git_bisect_step(feedback)
+            session_journal(state).append(state['previous_commit'], feedback, "human", verdict,
+                                          timings=timings, first_bad=bad_commit if finished else None)
+            if finished:
+                state['bisect_finished'] = True
+                state['bad_commit'] = bad_commit
+                print(f"First bad commit found: {bad_commit}")
+
+        current_commit, _, _ = repo.run_cmd("git rev-parse HEAD")
+        if (state.get('shown') or {}).get('commit') != current_commit:
+            state['shown'] = {"commit": current_commit, "at": time.time()}
+        file_content = bisect.diff_and_summarize(current_commit, state.get('previous_commit'))
+        repo.close()
 
     return render_template(
         "bisect.html",
         commit=current_commit,
         file_content=file_content,
-        bisect_finished=session.get('bisect_finished', False),
-        bad_commit=session.get('bad_commit')
+        bisect_finished=state.get('bisect_finished', False),
+        bad_commit=state.get('bad_commit')
     )
 
 
 @app.route("/get_summary", methods=["POST"])
 def get_summary():
-    if session.get('bisect_finished', False):
+    state = current_state()
+    if state is None:
+        return {"error": "No bisect session", "summary": None, "bisect_finished": False, "bad_commit": None}, 404
+    if state.get('bisect_finished', False):
         return {
-            "summary": "BISECT COMPLETE: first bad commit found at: " + session.get('bad_commit', None),  # No summary because bisect is done
+            "summary": "BISECT COMPLETE: first bad commit found at: " + state.get('bad_commit', None),  # No summary because bisect is done
             "bisect_finished": True,
-            "bad_commit": session.get('bad_commit', None)
+            "bad_commit": state.get('bad_commit', None)
         }
 
-    problem = session.get('problem')
-    summarizer = GPTDiffSummarizer(problem)
-    bisect = BisectSession(None, summarizer)
+    problem = state.get('problem')
+    summarizer = get_summarizer(SUMMARIZER, problem, cache=VERDICTS, pool=shared_pool())
 
     data = request.get_json()
     file_content = data.get('file_content', '')
-
-    summary = bisect.summarizer.summarize(file_content)
+    if not file_content.strip() or file_content.strip() == "No changes.":
+        return {"summary": None, "bisect_finished": False, "bad_commit": None}
+
+    started = time.time()
+    try:
+        summary = summarizer.analyse(file_content)
+        note_summary(state, summary, started)
+    except Exception as e:
+        return {
+            "error": f"{type(e).__name__}: {e}",
+            "summary": None,
+            "bisect_finished": False,
+            "bad_commit": None
+        }, 502
 
     return {
         "summary": summary,
@@ -166,6 +330,51 @@ def get_summary():
     }
 
 
+def sse(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@app.route("/stream_summary", methods=["POST"])
+def stream_summary():
+    state = current_state()
+    if state is None:
+        return {"error": "No bisect session"}, 404
+    if state.get('bisect_finished', False):
+        def finished():
+            yield sse({"bad_commit": state.get('bad_commit', None)}, event="finished")
+        return Response(stream_with_context(finished()), mimetype="text/event-stream")
+
+    problem = state.get('problem')
+    summarizer = get_summarizer(SUMMARIZER, problem, cache=VERDICTS, pool=shared_pool())
+    file_content = request.get_json().get('file_content', '')
+
+    def generate():
+        if not file_content.strip() or file_content.strip() == "No changes.":
+            yield sse({}, event="done")
+            return
+        started, parts = time.time(), []
+        chunks = summarizer.stream(file_content)
+        try:
+            for delta in chunks:
+                parts.append(delta)
+                yield sse({"delta": delta})
+            note_summary(state, "".join(parts), started)
+            yield sse({}, event="done")
+        except Exception as e:
+            yield sse({"error": str(e)}, event="error")
+        finally:
+            # Runs on client disconnect too, which closes the upstream model stream.
+            chunks.close()
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+if os.path.isdir(os.path.join(DEFAULT_REPO_PATH, TEMP_DIR_NAME)):
+    restore_sessions()
+
+
 # Run the app
 if __name__ == "__main__":
     app.run(debug=True)